@@ -3,12 +3,24 @@ ROM Builder Telegram Bot
 Converts Android base ROMs to super/hybrid format using GitHub Actions
 """
 import asyncio
+import functools
+import json
 import logging
 import time
+import uuid
+import zipfile
+from datetime import datetime, timedelta, timezone
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
-import requests
 from config import *
+from github_client import GitHubClient
+from run_poller import WorkflowRunPoller
+from poll_scheduler import PollScheduler
+from rom_probe import probe_rom
+from webhook_server import WebhookServer
+from job_store import open_job_store
+from job_queue import AdmissionScheduler
+from result_cache import is_sha256, result_cache_key
 
 # Enable logging
 logging.basicConfig(
@@ -17,8 +29,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Store active jobs
-active_jobs = {}
+# Parsed result artifacts per workflow run ID (runs never change once complete)
+workflow_results = {}
+
+# Persistent job store (survives restarts, evicts finished jobs after a TTL)
+job_store = open_job_store(JOB_STORE_URL)
+
+# Shared GitHub API client (one connection pool for all jobs)
+github = GitHubClient(
+    GITHUB_TOKEN,
+    GITHUB_REPO_OWNER,
+    GITHUB_REPO_NAME,
+    max_connections=GITHUB_MAX_CONNECTIONS,
+    max_concurrency=GITHUB_MAX_CONCURRENCY,
+    timeout=GITHUB_API_TIMEOUT
+)
+
+# Single poller shared by every monitored job
+run_poller = WorkflowRunPoller(github, WORKFLOW_FILE, interval=POLL_INTERVAL)
+
+# Learns conversion durations to pace polls and pick timeouts
+poll_scheduler = PollScheduler(
+    POLL_HISTORY_FILE,
+    default_interval=POLL_INTERVAL,
+    min_interval=MIN_POLL_INTERVAL,
+    max_interval=MAX_POLL_INTERVAL
+)
+
+# Optional push notifications from GitHub; polling remains the fallback
+webhook_server = None
+if WEBHOOK_SECRET:
+    webhook_server = WebhookServer(
+        WEBHOOK_SECRET,
+        run_poller.dispatch,
+        host=WEBHOOK_HOST,
+        port=WEBHOOK_PORT,
+        path=WEBHOOK_PATH
+    )
+
+# Caps concurrent workflow runs, queues the rest fairly per user
+# (dispatch callback is bound to the application in post_init)
+admission = AdmissionScheduler(MAX_CONCURRENT_JOBS)
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -31,7 +82,7 @@ Welcome! I can convert Android base ROMs to:
 • **Hybrid ROM** - Flashable via TWRP (dual A/B slots)
 
 **Usage:**
-`/convert <rom_url> <type>`
+`/convert <rom_url> <type> [sha256]`
 
 **Example:**
 `/convert https://example.com/rom.zip hybrid`
@@ -40,7 +91,9 @@ Welcome! I can convert Android base ROMs to:
 
 **Status:**
 `/status <job_id>` - Check conversion status
+`/cancel <job_id>` - Cancel a queued conversion
 
+Identical requests are served from earlier results or join a running job.
 The converted ROM will be uploaded to Google Drive and you'll receive the download link!
     """
     await update.message.reply_text(welcome_message, parse_mode='Markdown')
@@ -64,6 +117,7 @@ async def convert(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     rom_url = context.args[0]
     rom_type = context.args[1].lower()
+    rom_sha256 = context.args[2] if len(context.args) > 2 else None
     
     # Validate ROM type
     if rom_type not in ['super', 'hybrid']:
@@ -74,6 +128,14 @@ async def convert(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
+    if rom_sha256 and not is_sha256(rom_sha256):
+        await update.message.reply_text(
+            "❌ **Invalid SHA-256!**\n\n"
+            "The optional third argument must be the ROM's 64 character SHA-256.",
+            parse_mode='Markdown'
+        )
+        return
+    
     # Send processing message
     msg = await update.message.reply_text(
         f"🔄 **Processing your request...**\n\n"
@@ -84,39 +146,75 @@ async def convert(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     
     try:
-        # Trigger GitHub Actions workflow
-        workflow_run_id = trigger_github_workflow(rom_url, rom_type, user_id, chat_id)
-        
-        if not workflow_run_id:
-            await msg.edit_text(
-                "❌ **Failed to trigger workflow!**\n\n"
-                "Please check GitHub token and repository settings.",
-                parse_mode='Markdown'
-            )
-            return
+        # ROM size drives the adaptive polling schedule, validators the cache key
+        rom_info = await probe_rom(rom_url)
+        cache_key = result_cache_key(rom_url, rom_type, rom_info, rom_sha256)
         
         # Store job information
         job_id = f"{user_id}_{int(time.time())}"
-        active_jobs[job_id] = {
-            'workflow_run_id': workflow_run_id,
+        suffix = 1
+        while job_id in job_store:
+            job_id = f"{user_id}_{int(time.time())}_{suffix}"
+            suffix += 1
+        job = {
+            'user_id': user_id,
             'chat_id': chat_id,
+            'message_id': msg.message_id,
             'rom_type': rom_type,
             'rom_url': rom_url,
-            'status': 'running'
+            'rom_size': rom_info['size'],
+            'cache_key': cache_key,
+            'status': 'queued'
         }
         
-        await msg.edit_text(
-            f"✅ **Workflow triggered successfully!**\n\n"
-            f"Job ID: `{job_id}`\n"
-            f"Workflow Run ID: `{workflow_run_id}`\n\n"
-            f"⏳ Conversion in progress...\n"
-            f"You'll be notified when it's complete!\n\n"
-            f"Use `/status {job_id}` to check progress.",
-            parse_mode='Markdown'
-        )
+        # Same ROM and type already converted: reuse the result
+        cached = [
+            (source_id, source) for source_id, source in job_store.by_cache_key(cache_key, 'completed')
+            if (source.get('download_url') or '').startswith('http')
+        ]
+        if cached:
+            source_id, source = cached[-1]
+            job_store.put(job_id, dict(job, status='completed', cached_from=source_id,
+                                       download_url=source['download_url']))
+            await msg.edit_text(
+                f"✅ **Already converted!**\n\n"
+                f"Job ID: `{job_id}`\n"
+                f"ROM Type: `{rom_type}`\n\n"
+                f"📥 **Download Link:**\n{source['download_url']}",
+                parse_mode='Markdown'
+            )
+            return
+        
+        # Identical job still queued or running: wait for it instead of dispatching
+        in_progress = [
+            match for state in ('queued', 'dispatching', 'running')
+            for match in job_store.by_cache_key(cache_key, state)
+        ]
+        if in_progress:
+            source_id, _ = in_progress[0]
+            job_store.put(job_id, dict(job, status='waiting', attached_to=source_id))
+            await msg.edit_text(
+                f"🔗 **Identical conversion already in progress!**\n\n"
+                f"Job ID: `{job_id}`\n"
+                f"Attached to job `{source_id}`\n\n"
+                f"You'll be notified when it's complete!",
+                parse_mode='Markdown'
+            )
+            return
+        
+        job_store.put(job_id, job)
         
-        # Start monitoring workflow in background
-        asyncio.create_task(monitor_workflow(context.application, job_id))
+        # Dispatched right away if a slot is free, queued otherwise
+        position = admission.submit(job_id, user_id)
+        if position:
+            await msg.edit_text(
+                f"🕒 **Job queued!**\n\n"
+                f"Job ID: `{job_id}`\n"
+                f"Queue position: `{position}`\n\n"
+                f"The workflow starts automatically when a slot frees up.\n\n"
+                f"Use `/status {job_id}` to check progress.",
+                parse_mode='Markdown'
+            )
         
     except Exception as e:
         logger.error(f"Error in convert command: {e}")
@@ -126,6 +224,75 @@ async def convert(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
+async def dispatch_job(application: Application, job_id: str) -> bool:
+    """Trigger the workflow for an admitted job and start monitoring it."""
+    job = job_store.get(job_id)
+    if not job:
+        return False
+    
+    chat_id = job['chat_id']
+    
+    async def edit(text):
+        # Best effort: a failed edit (message deleted, flood wait) must not
+        # keep the job from being monitored or its waiters from being told
+        try:
+            await application.bot.edit_message_text(
+                text, chat_id=chat_id, message_id=job['message_id'], parse_mode='Markdown'
+            )
+        except Exception as e:
+            logger.error(f"Failed to update message for job {job_id}: {e}")
+    
+    # Trigger GitHub Actions workflow
+    workflow_run_id = await trigger_github_workflow(job['rom_url'], job['rom_type'], job['user_id'], chat_id, job_id)
+    
+    if not workflow_run_id:
+        job_store.update(job_id, status='failed', error='Failed to trigger workflow')
+        await finish_attached(application, job_id, "❌ **ROM Conversion Failed!**\n\nCould not trigger workflow.",
+                              status='failed', error='Failed to trigger workflow')
+        await edit(
+            "❌ **Failed to trigger workflow!**\n\n"
+            "Please check GitHub token and repository settings."
+        )
+        return False
+    
+    job_store.update(job_id, workflow_run_id=workflow_run_id, started_at=time.time(), status='running')
+    
+    # Start monitoring workflow in background
+    asyncio.create_task(monitor_workflow(application, job_id))
+    
+    await edit(
+        f"✅ **Workflow triggered successfully!**\n\n"
+        f"Job ID: `{job_id}`\n"
+        f"Workflow Run ID: `{workflow_run_id}`\n\n"
+        f"⏳ Conversion in progress...\n"
+        f"You'll be notified when it's complete!\n\n"
+        f"Use `/status {job_id}` to check progress."
+    )
+    return True
+
+
+async def resume_dispatch(application: Application, job_id: str):
+    """Pick up a job whose dispatch was interrupted by a restart."""
+    job = job_store.get(job_id)
+    workflow_run_id = None
+    if job.get('correlation_id'):
+        dispatched_at = datetime.fromtimestamp(job['dispatched_at'], timezone.utc)
+        try:
+            workflow_run_id = await resolve_dispatched_run(job['correlation_id'], dispatched_at)
+        except Exception as e:
+            logger.error(f"Failed to resolve run of job {job_id}: {e}")
+    
+    if not workflow_run_id:
+        # The dispatch never created a run: queue the job again
+        job_store.update(job_id, status='queued')
+        admission.release(job_id)
+        admission.submit(job_id, job['user_id'])
+        return
+    
+    job_store.update(job_id, workflow_run_id=workflow_run_id, started_at=time.time(), status='running')
+    asyncio.create_task(monitor_workflow(application, job_id))
+
+
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Check the status of a conversion job."""
     if len(context.args) < 1:
@@ -137,8 +304,9 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     job_id = context.args[0]
+    job = job_store.get(job_id)
     
-    if job_id not in active_jobs:
+    if job is None:
         await update.message.reply_text(
             "❌ **Job not found!**\n\n"
             f"Job ID `{job_id}` doesn't exist or has expired.",
@@ -146,8 +314,10 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    job = active_jobs[job_id]
     status_emoji = {
+        'queued': '🕒',
+        'dispatching': '🚀',
+        'waiting': '🔗',
         'running': '⏳',
         'completed': '✅',
         'failed': '❌'
@@ -156,6 +326,13 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     status_text = f"{status_emoji.get(job['status'], '❓')} **Status: {job['status'].upper()}**\n\n"
     status_text += f"Job ID: `{job_id}`\n"
     status_text += f"ROM Type: `{job['rom_type']}`\n"
+    position = admission.position(job_id) if job['status'] == 'queued' else 0
+    if position:
+        status_text += f"Queue Position: `{position}`\n"
+    if job['status'] == 'waiting':
+        status_text += f"Attached To: `{job['attached_to']}`\n"
+    if job['status'] == 'running' and job.get('run_status'):
+        status_text += f"Run Status: `{job['run_status']}`\n"
     
     if job['status'] == 'completed' and 'download_url' in job:
         status_text += f"\n📥 **Download Link:**\n{job['download_url']}"
@@ -165,14 +342,52 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(status_text, parse_mode='Markdown')
 
 
-def trigger_github_workflow(rom_url: str, rom_type: str, user_id: int, chat_id: int):
-    """Trigger GitHub Actions workflow via repository dispatch."""
-    url = f"https://api.github.com/repos/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}/actions/workflows/{WORKFLOW_FILE}/dispatches"
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Cancel a job that is still queued or waiting on an identical job."""
+    if len(context.args) < 1:
+        await update.message.reply_text(
+            "❌ **Invalid usage!**\n\n"
+            "Usage: `/cancel <job_id>`",
+            parse_mode='Markdown'
+        )
+        return
     
-    headers = {
-        'Authorization': f'token {GITHUB_TOKEN}',
-        'Accept': 'application/vnd.github.v3+json'
-    }
+    job_id = context.args[0]
+    job = job_store.get(job_id)
+    
+    if job is None or job['user_id'] != update.effective_user.id:
+        await update.message.reply_text(
+            "❌ **Job not found!**\n\n"
+            f"Job ID `{job_id}` doesn't exist or isn't yours.",
+            parse_mode='Markdown'
+        )
+        return
+    
+    if job['status'] == 'queued' and admission.cancel(job_id):
+        # Jobs attached to this one still want the result: the oldest takes its place
+        waiting = job_store.by_cache_key(job['cache_key'], 'waiting') if job.get('cache_key') else []
+        if waiting:
+            heir_id, heir = waiting[0]
+            for waiting_id, _ in waiting[1:]:
+                job_store.update(waiting_id, attached_to=heir_id)
+            job_store.update(heir_id, status='queued', attached_to=None)
+            admission.submit(heir_id, heir['user_id'])
+    elif job['status'] != 'waiting':
+        await update.message.reply_text(
+            f"❌ **Job `{job_id}` can't be cancelled**\n\n"
+            f"Only queued jobs can be cancelled, this one is {job['status']}.",
+            parse_mode='Markdown'
+        )
+        return
+    
+    job_store.update(job_id, status='failed', error='Cancelled by user')
+    await update.message.reply_text(f"🚫 **Job `{job_id}` cancelled.**", parse_mode='Markdown')
+
+
+async def trigger_github_workflow(rom_url: str, rom_type: str, user_id: int, chat_id: int, job_id: str = None):
+    """Trigger GitHub Actions workflow via repository dispatch."""
+    # Tag the dispatch so its run can be told apart from concurrent ones
+    correlation_id = uuid.uuid4().hex
     
     payload = {
         'ref': 'main',  # or 'master', depending on your default branch
@@ -180,153 +395,313 @@ def trigger_github_workflow(rom_url: str, rom_type: str, user_id: int, chat_id:
             'rom_url': rom_url,
             'rom_type': rom_type,
             'user_id': str(user_id),
-            'chat_id': str(chat_id)
+            'chat_id': str(chat_id),
+            'correlation_id': correlation_id
         }
     }
     
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        
-        # Get the latest workflow run ID
-        time.sleep(2)  # Wait for workflow to be created
-        runs_url = f"https://api.github.com/repos/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}/actions/runs"
-        runs_response = requests.get(runs_url, headers=headers)
-        runs_response.raise_for_status()
+        # Runs are filtered by creation time, allow for clock skew
+        dispatched_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+        if job_id is not None:
+            # Lets a restart find this run instead of dispatching a second one
+            job_store.update(job_id, correlation_id=correlation_id, dispatched_at=dispatched_at.timestamp())
+        await github.post(f"actions/workflows/{WORKFLOW_FILE}/dispatches", json=payload)
         
-        runs_data = runs_response.json()
-        if runs_data['workflow_runs']:
-            return runs_data['workflow_runs'][0]['id']
-        
-        return None
+        return await resolve_dispatched_run(correlation_id, dispatched_at)
         
     except Exception as e:
         logger.error(f"Failed to trigger workflow: {e}")
         return None
 
 
+async def resolve_dispatched_run(correlation_id: str, dispatched_at: datetime, attempts: int = 8):
+    """Find the run created by a dispatch, backing off until it shows up."""
+    params = {
+        'event': 'workflow_dispatch',
+        'created': f">={dispatched_at.strftime('%Y-%m-%dT%H:%M:%SZ')}",
+        'per_page': 100
+    }
+    delay = 1
+    
+    for _ in range(attempts):
+        await asyncio.sleep(delay)
+        runs_data = await github.get(f"actions/workflows/{WORKFLOW_FILE}/runs", params=params)
+        
+        for run in runs_data.get('workflow_runs', []):
+            # run-name carries the correlation ID (see rom-converter.yml)
+            if correlation_id in (run.get('name') or '') or correlation_id in (run.get('display_title') or ''):
+                return run['id']
+        
+        delay = min(delay * 2, 15)
+    
+    logger.error(f"Dispatched run {correlation_id} not found")
+    return None
+
+
+def format_duration(seconds: float) -> str:
+    """Human readable duration, e.g. '2 hours' or '45 minutes'."""
+    minutes = int(seconds // 60)
+    if minutes >= 120:
+        return f"{minutes // 60} hours"
+    return f"{minutes} minutes"
+
+
+def record_duration(job: dict, run: dict):
+    """Feed a successful run's duration into the polling scheduler."""
+    try:
+        started = datetime.fromisoformat(run['run_started_at'].replace('Z', '+00:00'))
+        finished = datetime.fromisoformat(run['updated_at'].replace('Z', '+00:00'))
+    except (KeyError, AttributeError, ValueError):
+        return
+    poll_scheduler.record(job['rom_type'], job.get('rom_size'), (finished - started).total_seconds())
+
+
+def on_run_update(run: dict):
+    """Fan a workflow run status change out to every job using that run."""
+    for job_id, job in job_store.by_run_id(run['id']):
+        if job['status'] == 'running':
+            job_store.update(job_id, run_status=run.get('status'))
+
+
+async def finish_attached(application: Application, job_id: str, message: str, **fields):
+    """Complete the jobs waiting on an identical job and notify their chats."""
+    job = job_store.get(job_id)
+    if not job or not job.get('cache_key'):
+        return
+    
+    for waiting_id, waiting in job_store.by_cache_key(job['cache_key'], 'waiting'):
+        job_store.update(waiting_id, **fields)
+        try:
+            await application.bot.send_message(
+                chat_id=waiting['chat_id'],
+                text=message,
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            logger.error(f"Failed to notify attached job {waiting_id}: {e}")
+
+
 async def monitor_workflow(application: Application, job_id: str):
     """Monitor GitHub Actions workflow completion."""
-    job = active_jobs.get(job_id)
+    job = job_store.get(job_id)
     if not job:
         return
     
+    try:
+        await wait_for_workflow(application, job_id, job)
+    finally:
+        # Free the concurrency slot for the next queued job
+        admission.release(job_id)
+
+
+async def wait_for_workflow(application: Application, job_id: str, job: dict):
+    """Wait for a job's workflow run to complete and notify the user."""
     workflow_run_id = job['workflow_run_id']
     chat_id = job['chat_id']
+    rom_type = job['rom_type']
+    rom_size = job.get('rom_size')
+    started_at = job.get('started_at') or job['created_at']
+    # Listing window for the poller, also covers jobs resumed after a restart
+    since = datetime.fromtimestamp(started_at, timezone.utc) - timedelta(minutes=10)
     
-    headers = {
-        'Authorization': f'token {GITHUB_TOKEN}',
-        'Accept': 'application/vnd.github.v3+json'
-    }
+    # Timeout and poll pacing come from historical durations
+    max_wait = poll_scheduler.timeout(rom_type, rom_size) - (time.time() - started_at)
     
-    poll_interval = 30  # Check every 30 seconds
-    max_attempts = 240  # 2 hours maximum (240 * 30 seconds)
-    attempts = 0
+    def schedule(_elapsed):
+        interval = poll_scheduler.next_interval(rom_type, rom_size, time.time() - started_at)
+        if webhook_server is not None:
+            # Webhooks deliver completion, polls only catch missed deliveries
+            interval = max(interval, WEBHOOK_FALLBACK_INTERVAL)
+        return interval
     
-    while attempts < max_attempts:
+    data = None
+    if max_wait <= 0:
+        # The deadline passed while the bot was down; the run may have
+        # finished meanwhile, so look it up once before timing it out
         try:
-            # Check workflow status
-            url = f"https://api.github.com/repos/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}/actions/runs/{workflow_run_id}"
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
+            run = await github.get(f"actions/runs/{workflow_run_id}")
+            if run.get('status') == 'completed':
+                data = run
+        except Exception as e:
+            logger.error(f"Failed to look up run {workflow_run_id}: {e}")
+    
+    try:
+        if data is None:
+            # The shared poller resolves this once the run completes
+            data = await asyncio.wait_for(
+                asyncio.shield(run_poller.watch(workflow_run_id, since=since, schedule=schedule)),
+                timeout=max(max_wait, 0)
+            )
+        conclusion = data.get('conclusion')
+        
+        if conclusion == 'success':
+            record_duration(job, data)
             
-            data = response.json()
-            status = data.get('status')
-            conclusion = data.get('conclusion')
+            # Get output from workflow (download link)
+            download_url = await get_workflow_output(workflow_run_id)
             
-            if status == 'completed':
-                if conclusion == 'success':
-                    # Get output from workflow (download link)
-                    download_url = get_workflow_output(workflow_run_id)
-                    
-                    job['status'] = 'completed'
-                    job['download_url'] = download_url
-                    
-                    message = (
-                        f"✅ **ROM Conversion Complete!**\n\n"
-                        f"ROM Type: `{job['rom_type']}`\n\n"
-                        f"📥 **Download Link:**\n{download_url}\n\n"
-                        f"Hash will be in the Drive folder!"
-                    )
-                    
-                    await application.bot.send_message(
-                        chat_id=chat_id,
-                        text=message,
-                        parse_mode='Markdown'
-                    )
-                else:
-                    job['status'] = 'failed'
-                    job['error'] = f"Workflow failed with conclusion: {conclusion}"
-                    
-                    await application.bot.send_message(
-                        chat_id=chat_id,
-                        text=f"❌ **ROM Conversion Failed!**\n\nConclusion: {conclusion}",
-                        parse_mode='Markdown'
-                    )
-                
-                return
+            job_store.update(job_id, status='completed', download_url=download_url)
             
-            attempts += 1
-            await asyncio.sleep(poll_interval)
+            message = (
+                f"✅ **ROM Conversion Complete!**\n\n"
+                f"ROM Type: `{job['rom_type']}`\n\n"
+                f"📥 **Download Link:**\n{download_url}\n\n"
+            )
+            result = workflow_results.get(workflow_run_id) or {}
+            if result.get('sha256'):
+                message += f"MD5: `{result.get('md5')}`\nSHA-256: `{result['sha256']}`"
+            else:
+                message += "Hash will be in the Drive folder!"
             
-        except Exception as e:
-            logger.error(f"Error monitoring workflow: {e}")
-            job['status'] = 'failed'
-            job['error'] = str(e)
+            await application.bot.send_message(
+                chat_id=chat_id,
+                text=message,
+                parse_mode='Markdown'
+            )
+            await finish_attached(application, job_id, message, status='completed', download_url=download_url)
+        else:
+            job_store.update(job_id, status='failed', error=f"Workflow failed with conclusion: {conclusion}")
             
+            message = f"❌ **ROM Conversion Failed!**\n\nConclusion: {conclusion}"
             await application.bot.send_message(
                 chat_id=chat_id,
-                text=f"❌ **Error monitoring workflow:**\n{str(e)}",
+                text=message,
                 parse_mode='Markdown'
             )
-            return
+            await finish_attached(application, job_id, message, status='failed',
+                                  error=f"Workflow failed with conclusion: {conclusion}")
+        
+    except asyncio.TimeoutError:
+        run_poller.unwatch(workflow_run_id)
+        limit = format_duration(poll_scheduler.timeout(rom_type, rom_size))
+        job_store.update(job_id, status='failed', error=f'Workflow timeout (exceeded {limit})')
+        
+        message = f"❌ **Workflow timeout!**\n\nConversion took longer than {limit}."
+        await application.bot.send_message(
+            chat_id=chat_id,
+            text=message,
+            parse_mode='Markdown'
+        )
+        await finish_attached(application, job_id, message, status='failed',
+                              error=f'Workflow timeout (exceeded {limit})')
+        
+    except Exception as e:
+        logger.error(f"Error monitoring workflow: {e}")
+        job_store.update(job_id, status='failed', error=str(e))
+        
+        message = f"❌ **Error monitoring workflow:**\n{str(e)}"
+        await application.bot.send_message(
+            chat_id=chat_id,
+            text=message,
+            parse_mode='Markdown'
+        )
+        await finish_attached(application, job_id, message, status='failed', error=str(e))
+
+
+async def get_workflow_result(workflow_run_id: int):
+    """Read the run's result artifact (Drive link and checksums), cached per run."""
+    if workflow_run_id in workflow_results:
+        return workflow_results[workflow_run_id]
     
-    # Timeout
-    job['status'] = 'failed'
-    job['error'] = 'Workflow timeout (exceeded 2 hours)'
+    data = await github.get(f"actions/runs/{workflow_run_id}/artifacts", params={'name': RESULT_ARTIFACT_NAME})
+    artifacts = [a for a in data.get('artifacts', []) if not a.get('expired')]
+    if not artifacts:
+        return None
     
-    await application.bot.send_message(
-        chat_id=chat_id,
-        text="❌ **Workflow timeout!**\n\nConversion took longer than 2 hours.",
-        parse_mode='Markdown'
-    )
+    # Zip is streamed into memory and parsed there, nothing touches the disk
+    archive = await github.download(artifacts[0]['archive_download_url'])
+    with zipfile.ZipFile(archive) as zf:
+        result = json.loads(zf.read(RESULT_FILE_NAME))
+    
+    workflow_results[workflow_run_id] = result
+    while len(workflow_results) > 256:
+        workflow_results.pop(next(iter(workflow_results)))
+    return result
 
 
-def get_workflow_output(workflow_run_id: int) -> str:
+async def get_workflow_output(workflow_run_id: int) -> str:
     """Get the download URL from workflow artifacts or output."""
-    headers = {
-        'Authorization': f'token {GITHUB_TOKEN}',
-        'Accept': 'application/vnd.github.v3+json'
-    }
-    
-    # Check for artifacts that contain the download URL
-    url = f"https://api.github.com/repos/{GITHUB_REPO_OWNER}/{GITHUB_REPO_NAME}/actions/runs/{workflow_run_id}/artifacts"
-    
+    # The workflow uploads a result artifact containing the download URL
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        data = response.json()
-        # The workflow will create a text artifact with the download URL
-        # This is a placeholder - actual implementation will read from artifact
-        
-        # For now, return a placeholder
-        return "https://drive.google.com/YOUR_DOWNLOAD_LINK"
+        result = await get_workflow_result(workflow_run_id)
+        if result and result.get('download_url'):
+            return result['download_url']
         
     except Exception as e:
         logger.error(f"Failed to get workflow output: {e}")
-        return "Download link unavailable - check Google Drive folder"
+    
+    return "Download link unavailable - check Google Drive folder"
+
+
+async def evict_finished_jobs():
+    """Periodically drop finished jobs older than JOB_TTL_HOURS."""
+    while True:
+        try:
+            evicted = job_store.evict_finished(JOB_TTL_HOURS * 60 * 60)
+            if evicted:
+                logger.info(f"Evicted {evicted} finished jobs")
+        except Exception as e:
+            logger.error(f"Failed to evict finished jobs: {e}")
+        await asyncio.sleep(60 * 60)
+
+
+async def post_init(application: Application):
+    """Open shared resources once the event loop is running."""
+    await github.start()
+    run_poller.add_listener(on_run_update)
+    run_poller.start()
+    if webhook_server is not None:
+        await webhook_server.start()
+    
+    application.bot_data['eviction_task'] = asyncio.create_task(evict_finished_jobs())
+    
+    # Resume monitoring of jobs that were in flight before a restart
+    admission.dispatch = functools.partial(dispatch_job, application)
+    admission.on_admit = lambda job_id: job_store.update(job_id, status='dispatching')
+    for job_id, job in job_store.in_flight():
+        logger.info(f"Resuming monitoring of job {job_id}")
+        admission.occupy(job_id, job['user_id'])
+        asyncio.create_task(monitor_workflow(application, job_id))
+    
+    # Jobs admitted but not yet running may already have a workflow run
+    for job_id, job in job_store.find(status='dispatching'):
+        logger.info(f"Resuming dispatch of job {job_id}")
+        admission.occupy(job_id, job['user_id'])
+        asyncio.create_task(resume_dispatch(application, job_id))
+    
+    # Re-queue jobs that were waiting for a slot
+    for job_id, job in job_store.find(status='queued'):
+        admission.submit(job_id, job['user_id'])
+
+
+async def post_shutdown(application: Application):
+    """Release shared resources on shutdown."""
+    if webhook_server is not None:
+        await webhook_server.stop()
+    await run_poller.stop()
+    application.bot_data['eviction_task'].cancel()
+    logger.info(f"GitHub API cache: {github.cache.stats()}")
+    await github.close()
+    job_store.close()
 
 
 def main():
     """Start the bot."""
     # Create the Application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # Register command handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("convert", convert))
     application.add_handler(CommandHandler("status", status))
+    application.add_handler(CommandHandler("cancel", cancel))
     
     # Start the bot
     logger.info("Starting ROM Builder Bot...")
@@ -14,6 +14,27 @@ GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 GITHUB_REPO_OWNER = os.getenv('GITHUB_REPO_OWNER')
 GITHUB_REPO_NAME = os.getenv('GITHUB_REPO_NAME')
 
+# GitHub API client settings
+GITHUB_API_TIMEOUT = int(os.getenv('GITHUB_API_TIMEOUT', '30'))
+GITHUB_MAX_CONNECTIONS = int(os.getenv('GITHUB_MAX_CONNECTIONS', '10'))
+GITHUB_MAX_CONCURRENCY = int(os.getenv('GITHUB_MAX_CONCURRENCY', '8'))
+
+# Seconds between workflow run polls (one batched API call per tick)
+POLL_INTERVAL = int(os.getenv('POLL_INTERVAL', '30'))
+
+# Adaptive polling bounds and learned duration history
+MIN_POLL_INTERVAL = int(os.getenv('MIN_POLL_INTERVAL', '10'))
+MAX_POLL_INTERVAL = int(os.getenv('MAX_POLL_INTERVAL', '300'))
+POLL_HISTORY_FILE = os.getenv('POLL_HISTORY_FILE', 'poll_history.json')
+
+# Optional GitHub webhook endpoint (enabled when a secret is set)
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/github/webhook')
+# Polling becomes a slow fallback while webhooks are delivering
+WEBHOOK_FALLBACK_INTERVAL = int(os.getenv('WEBHOOK_FALLBACK_INTERVAL', '600'))
+
 # Google Drive Configuration
 DRIVE_FOLDER_PATH = os.getenv('DRIVE_FOLDER_PATH', 'ROM_Builds')
 RCLONE_REMOTE_NAME = os.getenv('RCLONE_REMOTE_NAME', 'gdrive')
@@ -22,5 +43,13 @@ RCLONE_REMOTE_NAME = os.getenv('RCLONE_REMOTE_NAME', 'gdrive')
 ALLOWED_ROM_EXTENSIONS = ['.zip', '.img', '.tar', '.tar.gz', '.tgz']
 MAX_CONCURRENT_JOBS = int(os.getenv('MAX_CONCURRENT_JOBS', '3'))
 
+# Job persistence: sqlite:///path/to/jobs.db or memory://
+JOB_STORE_URL = os.getenv('JOB_STORE_URL', 'sqlite:///jobs.db')
+# Finished jobs are kept for /status this long before eviction
+JOB_TTL_HOURS = int(os.getenv('JOB_TTL_HOURS', '168'))
+
 # GitHub Actions Workflow
 WORKFLOW_FILE = 'rom-converter.yml'
+# Artifact uploaded by the workflow with the Drive link and checksums
+RESULT_ARTIFACT_NAME = 'rom-result'
+RESULT_FILE_NAME = 'result.json'
@@ -0,0 +1,218 @@
+"""
+Async GitHub API client for ROM Builder Bot
+One shared keep-alive connection pool for every GitHub call the bot makes
+"""
+import asyncio
+import io
+import logging
+from collections import OrderedDict
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+GITHUB_API_URL = 'https://api.github.com'
+
+
+class ConditionalCache:
+    """ETag / Last-Modified response cache keyed by URL.
+
+    GitHub answers conditional requests with 304 Not Modified when nothing
+    changed, and those responses do not count against the rate limit.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(url: str, params=None) -> str:
+        if not params:
+            return url
+        query = '&'.join(f"{k}={params[k]}" for k in sorted(params))
+        return f"{url}?{query}"
+
+    def headers(self, key: str) -> dict:
+        """Conditional request headers for a cached entry."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def hit(self, key: str):
+        """Return the cached body for a 304 response, None if it was evicted."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry['body']
+
+    def store(self, key: str, response_headers, body):
+        """Remember a fresh response if it carries validators."""
+        self.misses += 1
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        self._entries[key] = {'etag': etag, 'last_modified': last_modified, 'body': body}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'hit_ratio': self.hits / total if total else 0.0
+        }
+
+
+class GitHubClient:
+    """Pooled async client for the GitHub REST API.
+
+    All requests share one aiohttp session (keep-alive connection pool),
+    carry a per-request timeout and are bounded by a semaphore so a burst
+    of jobs cannot open an unbounded number of sockets. GET requests are
+    made conditional through a ConditionalCache.
+    """
+
+    def __init__(self, token: str, owner: str, repo: str,
+                 max_connections: int = 10, max_concurrency: int = 8,
+                 timeout: float = 30):
+        self.token = token
+        self.owner = owner
+        self.repo = repo
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.cache = ConditionalCache()
+        self._session = None
+        self._semaphore = None
+
+    @property
+    def repo_url(self) -> str:
+        """Base URL for repository scoped endpoints."""
+        return f"{GITHUB_API_URL}/repos/{self.owner}/{self.repo}"
+
+    async def start(self):
+        """Open the shared session (idempotent)."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            keepalive_timeout=60,
+            ttl_dns_cache=300
+        )
+        # Auth is added per request so redirects to blob storage stay anonymous
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        """Close the shared session and its connection pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def _headers(self) -> dict:
+        return {
+            'Authorization': f'token {self.token}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+
+    def _url(self, path: str) -> str:
+        if path.startswith('http'):
+            return path
+        return f"{self.repo_url}/{path.lstrip('/')}"
+
+    async def request(self, method: str, path: str, *, params=None, json=None, timeout=None):
+        """Send a request and return the decoded JSON body (or None if empty).
+
+        Raises aiohttp.ClientResponseError for non-2xx responses.
+        """
+        await self.start()
+        url = self._url(path)
+        kwargs = {'params': params, 'json': json, 'headers': self._headers}
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+
+        cache_key = None
+        if method == 'GET':
+            cache_key = self.cache.key(url, params)
+            kwargs['headers'].update(self.cache.headers(cache_key))
+
+        async with self._semaphore:
+            async with self._session.request(method, url, **kwargs) as response:
+                if response.status == 304 and cache_key is not None:
+                    body = self.cache.hit(cache_key)
+                    if body is not None:
+                        return body
+                else:
+                    response.raise_for_status()
+                    if response.status == 204:
+                        return None
+                    body = await response.json()
+                    if cache_key is not None:
+                        self.cache.store(cache_key, response.headers, body)
+                    return body
+
+            # The entry was evicted while the request was out; ask again unconditionally
+            kwargs['headers'] = self._headers
+            async with self._session.request(method, url, **kwargs) as response:
+                response.raise_for_status()
+                body = await response.json()
+                self.cache.store(cache_key, response.headers, body)
+                return body
+
+    async def get(self, path: str, params=None, timeout=None):
+        """GET a repository endpoint and return its JSON body."""
+        return await self.request('GET', path, params=params, timeout=timeout)
+
+    async def post(self, path: str, json=None, timeout=None):
+        """POST to a repository endpoint and return its JSON body."""
+        return await self.request('POST', path, json=json, timeout=timeout)
+
+    async def download(self, url: str, max_bytes: int = 16 * 1024 * 1024, timeout=None) -> io.BytesIO:
+        """Stream an authenticated download (e.g. an artifact zip) into memory.
+
+        GitHub answers with a redirect to a short-lived blob storage URL; it is
+        followed without the Authorization header.
+        """
+        await self.start()
+        # An explicit timeout=None would turn the session timeout off
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else self.timeout
+        buffer = io.BytesIO()
+
+        async with self._semaphore:
+            async with self._session.get(self._url(url), headers=self._headers,
+                                         allow_redirects=False, timeout=request_timeout) as response:
+                if response.status in (301, 302, 303, 307, 308):
+                    location = response.headers['Location']
+                else:
+                    response.raise_for_status()
+                    location = None
+                    await self._read_into(response, buffer, max_bytes)
+
+            if location is not None:
+                async with self._session.get(location, timeout=request_timeout) as response:
+                    response.raise_for_status()
+                    await self._read_into(response, buffer, max_bytes)
+
+        buffer.seek(0)
+        return buffer
+
+    @staticmethod
+    async def _read_into(response, buffer, max_bytes: int):
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            buffer.write(chunk)
+            if buffer.tell() > max_bytes:
+                raise ValueError(f"Download exceeds {max_bytes} bytes")
@@ -0,0 +1,119 @@
+"""
+Admission scheduler for ROM Builder Bot
+Caps concurrent workflow runs and queues the rest fairly per user
+"""
+import asyncio
+import logging
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionScheduler:
+    """Global concurrency cap with round-robin fair queuing across users.
+
+    ``submit`` queues a job under its user; whenever a slot is free the next
+    job is taken from the user with the fewest running jobs (ties broken in
+    rotation order), so one user sending ten /convert commands cannot
+    starve everyone else. Admitted jobs are handed
+    to the async ``dispatch(job_id)`` callback (which must be set before
+    the first submit) and should return True once the job is running;
+    ``release`` frees the slot when the job has finished. The optional
+    ``on_admit(job_id)`` callback runs synchronously as a job leaves the
+    queue, before its dispatch starts.
+    """
+
+    def __init__(self, max_concurrent: int, dispatch=None, on_admit=None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.dispatch = dispatch
+        self.on_admit = on_admit
+        self._queues = OrderedDict()
+        self._running = {}
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def occupy(self, job_id: str, user_id: int = None):
+        """Count an already dispatched job (e.g. resumed after restart) against the cap."""
+        self._running[job_id] = user_id
+
+    def submit(self, job_id: str, user_id: int) -> int:
+        """Queue a job and return its queue position (0 = dispatched now)."""
+        self._queues.setdefault(user_id, deque()).append(job_id)
+        self._pump()
+        return self.position(job_id)
+
+    def release(self, job_id: str):
+        """Free the slot held by a job and admit the next queued one."""
+        self._running.pop(job_id, None)
+        self._pump()
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a job that has not been dispatched yet."""
+        for user_id, queue in list(self._queues.items()):
+            if job_id in queue:
+                queue.remove(job_id)
+                if not queue:
+                    del self._queues[user_id]
+                return True
+        return False
+
+    def _load(self):
+        """Running job count per user."""
+        load = {}
+        for user_id in self._running.values():
+            load[user_id] = load.get(user_id, 0) + 1
+        return load
+
+    @staticmethod
+    def _pick(queues, load):
+        # Least loaded user wins; min() keeps rotation order among ties
+        return min(queues, key=lambda user_id: load.get(user_id, 0))
+
+    def order(self):
+        """Queued job IDs in the order they will be dispatched (if no job finishes)."""
+        queues = OrderedDict((user_id, deque(queue)) for user_id, queue in self._queues.items())
+        load = self._load()
+        result = []
+        while queues:
+            user_id = self._pick(queues, load)
+            queue = queues.pop(user_id)
+            result.append(queue.popleft())
+            load[user_id] = load.get(user_id, 0) + 1
+            if queue:
+                queues[user_id] = queue
+        return result
+
+    def position(self, job_id: str) -> int:
+        """1-based queue position, 0 if the job is not queued."""
+        try:
+            return self.order().index(job_id) + 1
+        except ValueError:
+            return 0
+
+    def _pump(self):
+        while self._queues and len(self._running) < self.max_concurrent:
+            # Serve the chosen user, then move them to the back of the rotation
+            user_id = self._pick(self._queues, self._load())
+            queue = self._queues.pop(user_id)
+            job_id = queue.popleft()
+            if queue:
+                self._queues[user_id] = queue
+            self._running[job_id] = user_id
+            if self.on_admit is not None:
+                self.on_admit(job_id)
+            asyncio.create_task(self._dispatch(job_id))
+
+    async def _dispatch(self, job_id: str):
+        try:
+            admitted = await self.dispatch(job_id)
+        except Exception as e:
+            logger.error(f"Failed to dispatch job {job_id}: {e}")
+            admitted = False
+        if not admitted:
+            self.release(job_id)
@@ -0,0 +1,237 @@
+"""
+Persistent job store for ROM Builder Bot
+Pluggable backends; SQLite (WAL mode) is the default
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Job fields stored as indexed columns, everything else lives in the JSON blob
+COLUMNS = ('user_id', 'chat_id', 'workflow_run_id', 'cache_key', 'status', 'created_at', 'updated_at', 'finished_at')
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+class JobStore:
+    """Interface shared by job store backends.
+
+    Jobs are plain dicts keyed by job_id. ``update`` merges fields and
+    stamps ``updated_at`` (and ``finished_at`` once a job reaches a final
+    status) so finished jobs can be evicted after a TTL.
+    """
+
+    def put(self, job_id: str, job: dict):
+        raise NotImplementedError
+
+    def get(self, job_id: str):
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields):
+        raise NotImplementedError
+
+    def find(self, **criteria):
+        """Return [(job_id, job)] matching all indexed column values."""
+        raise NotImplementedError
+
+    def evict_finished(self, ttl: float) -> int:
+        """Drop finished jobs older than ``ttl`` seconds, return the count."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __contains__(self, job_id):
+        return self.get(job_id) is not None
+
+    def by_user(self, user_id: int):
+        return self.find(user_id=user_id)
+
+    def by_chat(self, chat_id: int):
+        return self.find(chat_id=chat_id)
+
+    def by_run_id(self, workflow_run_id: int):
+        return self.find(workflow_run_id=workflow_run_id)
+
+    def by_cache_key(self, cache_key: str, status: str):
+        return self.find(cache_key=cache_key, status=status)
+
+    def in_flight(self):
+        """Jobs whose workflow run is still being monitored."""
+        return self.find(status='running')
+
+    @staticmethod
+    def _stamp(fields: dict) -> dict:
+        now = time.time()
+        fields.setdefault('updated_at', now)
+        if fields.get('status') in FINISHED_STATUSES:
+            fields.setdefault('finished_at', now)
+        return fields
+
+
+class MemoryJobStore(JobStore):
+    """Non-persistent backend, mainly for development."""
+
+    def __init__(self):
+        self._jobs = {}
+
+    def put(self, job_id: str, job: dict):
+        job = self._stamp(dict(job))
+        job.setdefault('created_at', job['updated_at'])
+        self._jobs[job_id] = job
+
+    def get(self, job_id: str):
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields):
+        if job_id in self._jobs:
+            self._jobs[job_id].update(self._stamp(fields))
+
+    def find(self, **criteria):
+        return [
+            (job_id, dict(job)) for job_id, job in self._jobs.items()
+            if all(job.get(key) == value for key, value in criteria.items())
+        ]
+
+    def evict_finished(self, ttl: float) -> int:
+        cutoff = time.time() - ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.get('finished_at') and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite backend in WAL mode with indexes on every lookup key."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            chat_id INTEGER,
+            workflow_run_id INTEGER,
+            cache_key TEXT,
+            status TEXT,
+            created_at REAL,
+            updated_at REAL,
+            finished_at REAL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_user_id ON jobs (user_id);
+        CREATE INDEX IF NOT EXISTS idx_jobs_chat_id ON jobs (chat_id);
+        CREATE INDEX IF NOT EXISTS idx_jobs_workflow_run_id ON jobs (workflow_run_id);
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, finished_at);
+    """
+
+    # Columns added after the first schema version: (name, type, index statement)
+    MIGRATIONS = (
+        ('cache_key', 'TEXT', 'CREATE INDEX IF NOT EXISTS idx_jobs_cache_key ON jobs (cache_key, status)'),
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        existing = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        for name, column_type, index in self.MIGRATIONS:
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+            self._conn.execute(index)
+
+    @staticmethod
+    def _split(job: dict):
+        columns = {key: job.get(key) for key in COLUMNS}
+        data = {key: value for key, value in job.items() if key not in COLUMNS}
+        return columns, json.dumps(data)
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        job = json.loads(row['data'])
+        for key in COLUMNS:
+            job[key] = row[key]
+        return job
+
+    def put(self, job_id: str, job: dict):
+        job = self._stamp(dict(job))
+        job.setdefault('created_at', job['updated_at'])
+        columns, data = self._split(job)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs (job_id, {', '.join(COLUMNS)}, data) "
+                f"VALUES (?, {', '.join('?' for _ in COLUMNS)}, ?)",
+                (job_id, *columns.values(), data)
+            )
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+                if row is None:
+                    self._conn.execute('ROLLBACK')
+                    return
+                job = self._row_to_job(row)
+                job.update(self._stamp(fields))
+                columns, data = self._split(job)
+                assignments = ', '.join(f"{key} = ?" for key in COLUMNS)
+                self._conn.execute(
+                    f"UPDATE jobs SET {assignments}, data = ? WHERE job_id = ?",
+                    (*columns.values(), data, job_id)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def find(self, **criteria):
+        for key in criteria:
+            if key not in COLUMNS:
+                raise ValueError(f"Cannot look up jobs by unindexed field: {key}")
+        where = ' AND '.join(f"{key} = ?" for key in criteria) or '1'
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE {where} ORDER BY created_at",
+                tuple(criteria.values())
+            ).fetchall()
+        return [(row['job_id'], self._row_to_job(row)) for row in rows]
+
+    def evict_finished(self, ttl: float) -> int:
+        cutoff = time.time() - ttl
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' for _ in FINISHED_STATUSES)}) "
+                "AND finished_at < ?",
+                (*FINISHED_STATUSES, cutoff)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_job_store(url: str) -> JobStore:
+    """Create a job store from a URL: ``sqlite:///path/to/jobs.db`` or ``memory://``."""
+    if url.startswith('sqlite:///'):
+        return SQLiteJobStore(url[len('sqlite:///'):])
+    if url.startswith('memory:'):
+        return MemoryJobStore()
+    raise ValueError(f"Unsupported job store: {url}")
@@ -0,0 +1,123 @@
+"""
+Adaptive polling schedule for ROM Builder Bot
+Learns conversion durations per ROM type and size from completed jobs
+"""
+import json
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+GIB = 1024 ** 3
+
+
+def _percentile(samples, fraction):
+    """Linear interpolated percentile of a sorted list."""
+    if not samples:
+        return None
+    position = (len(samples) - 1) * fraction
+    low = math.floor(position)
+    high = math.ceil(position)
+    if low == high:
+        return samples[low]
+    return samples[low] + (samples[high] - samples[low]) * (position - low)
+
+
+class PollScheduler:
+    """Pick poll intervals and timeouts from historical conversion durations.
+
+    Durations are kept per ``rom_type`` and per ``rom_type`` + ROM size
+    bucket (powers of two in GiB). Polls are sparse early in a run, dense
+    around the expected finish window (p10..p90) and moderate afterwards.
+    Without enough history the fixed defaults are used.
+    """
+
+    def __init__(self, path: str = None, default_interval: float = 30,
+                 min_interval: float = 10, max_interval: float = 300,
+                 default_timeout: float = 2 * 60 * 60, min_samples: int = 3,
+                 max_samples: int = 50):
+        self.path = path
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_timeout = default_timeout
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.history = {}
+        self.load()
+
+    @staticmethod
+    def size_bucket(rom_size) -> str:
+        """Power-of-two GiB bucket for a ROM size in bytes."""
+        if not rom_size:
+            return 'unknown'
+        return f"{2 ** max(0, math.ceil(math.log2(rom_size / GIB)))}G"
+
+    def load(self):
+        """Load duration history from disk."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.history = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load poll history: {e}")
+
+    def save(self):
+        """Persist duration history to disk."""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.history, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to save poll history: {e}")
+
+    def record(self, rom_type: str, rom_size, duration: float):
+        """Record the duration (seconds) of a completed conversion."""
+        for key in (rom_type, f"{rom_type}:{self.size_bucket(rom_size)}"):
+            samples = self.history.setdefault(key, [])
+            samples.append(round(duration, 1))
+            del samples[:-self.max_samples]
+        self.save()
+
+    def samples(self, rom_type: str, rom_size=None):
+        """Sorted durations for the most specific key with enough history."""
+        for key in (f"{rom_type}:{self.size_bucket(rom_size)}", rom_type):
+            samples = self.history.get(key, [])
+            if len(samples) >= self.min_samples:
+                return sorted(samples)
+        return []
+
+    def estimate(self, rom_type: str, rom_size=None):
+        """Return (p10, median, p90) duration estimate or None."""
+        samples = self.samples(rom_type, rom_size)
+        if not samples:
+            return None
+        return (_percentile(samples, 0.1), _percentile(samples, 0.5), _percentile(samples, 0.9))
+
+    def next_interval(self, rom_type: str, rom_size, elapsed: float) -> float:
+        """Seconds to wait before the next poll of a run ``elapsed`` seconds old."""
+        estimate = self.estimate(rom_type, rom_size)
+        if estimate is None:
+            return self.default_interval
+
+        early, _, late = estimate
+        if elapsed < early:
+            # Sparse: halve the remaining distance to the finish window
+            interval = (early - elapsed) / 2
+        elif elapsed <= late:
+            interval = self.min_interval
+        else:
+            interval = self.default_interval
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def timeout(self, rom_type: str, rom_size=None) -> float:
+        """Seconds after which a run is considered stuck."""
+        samples = self.samples(rom_type, rom_size)
+        if not samples:
+            return self.default_timeout
+        return max(samples[-1] * 1.5, _percentile(samples, 0.9) * 2, 30 * 60)
@@ -0,0 +1,47 @@
+"""
+Conversion result cache keys for ROM Builder Bot
+Identical requests map to the same key so finished results can be reused
+"""
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+SHA256_RE = re.compile(r'^[0-9a-fA-F]{64}$')
+
+# Query parameters that never change the downloaded file
+IGNORED_QUERY_PARAMS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'ref')
+
+
+def normalize_rom_url(url: str) -> str:
+    """Canonical form of a ROM URL (case, default ports, query order, fragment)."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in IGNORED_QUERY_PARAMS
+    )
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+
+def is_sha256(value: str) -> bool:
+    return bool(value) and bool(SHA256_RE.match(value))
+
+
+def result_cache_key(rom_url: str, rom_type: str, rom_info: dict = None, rom_sha256: str = None) -> str:
+    """Cache key for a conversion request.
+
+    A known ROM SHA-256 identifies the content regardless of URL; otherwise
+    the normalized URL is combined with the size and validator (ETag or
+    Last-Modified) from a HEAD probe so a re-uploaded file gets a new key.
+    """
+    if rom_sha256:
+        identity = f"sha256:{rom_sha256.lower()}"
+    else:
+        rom_info = rom_info or {}
+        validator = rom_info.get('etag') or rom_info.get('last_modified') or ''
+        identity = f"url:{normalize_rom_url(rom_url)}|{rom_info.get('size') or ''}|{validator}"
+    return hashlib.sha256(f"{rom_type}|{identity}".encode()).hexdigest()
@@ -0,0 +1,30 @@
+"""
+ROM URL probing for ROM Builder Bot
+Cheap HEAD request to learn size and validators before dispatching a job
+"""
+import logging
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+async def probe_rom(url: str, timeout: float = 15) -> dict:
+    """HEAD the ROM URL and return its size and cache validators.
+
+    Missing fields are None; probing never raises, a ROM host that does not
+    answer HEAD just yields an empty result.
+    """
+    info = {'url': url, 'final_url': url, 'size': None, 'etag': None, 'last_modified': None}
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            async with session.head(url, allow_redirects=True) as response:
+                if response.status >= 400:
+                    return info
+                info['final_url'] = str(response.url)
+                if response.content_length:
+                    info['size'] = response.content_length
+                info['etag'] = response.headers.get('ETag')
+                info['last_modified'] = response.headers.get('Last-Modified')
+    except Exception as e:
+        logger.warning(f"Failed to probe ROM URL: {e}")
+    return info
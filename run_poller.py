@@ -0,0 +1,198 @@
+"""
+Batched GitHub Actions run poller for ROM Builder Bot
+One listing call per tick serves every job being monitored
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_time(value: str) -> datetime:
+    """Parse a GitHub ISO-8601 timestamp."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _format_time(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class WorkflowRunPoller:
+    """Central poller for workflow runs.
+
+    Instead of one polling task per job, a single loop lists the workflow's
+    runs created since the oldest watched run (paginated) on each tick and
+    fans the results out: listeners see every status change and waiters of a
+    run are resolved once it completes. API usage per tick is flat in the
+    number of watched runs.
+
+    Each run may carry its own schedule (a callable mapping seconds since it
+    was watched to seconds until its next poll); a tick happens when the
+    earliest run is due, never more often than ``min_interval``.
+    """
+
+    def __init__(self, client, workflow_file: str, interval: float = 30,
+                 min_interval: float = 5, per_page: int = 100, max_pages: int = 5):
+        self.client = client
+        self.workflow_file = workflow_file
+        self.interval = interval
+        self.min_interval = min_interval
+        self.per_page = per_page
+        self.max_pages = max_pages
+        self._waiters = {}
+        self._since = {}
+        self._schedules = {}
+        self._due = {}
+        self._last_poll = 0.0
+        self._last_status = {}
+        self._listeners = []
+        self._task = None
+        self._wakeup = None
+
+    def add_listener(self, callback):
+        """Register callback(run) called for every observed status change."""
+        self._listeners.append(callback)
+
+    def watch(self, run_id: int, since: datetime = None, schedule=None) -> asyncio.Future:
+        """Return a future resolved with the run JSON when the run completes.
+
+        ``schedule`` is an optional callable(elapsed) -> seconds until the
+        next poll this run needs; the fixed interval is used otherwise.
+        """
+        future = self._waiters.get(run_id)
+        if future is None or future.done():
+            future = asyncio.get_running_loop().create_future()
+            self._waiters[run_id] = future
+            # Runs are listed by creation time, leave slack for clock skew
+            self._since[run_id] = since or datetime.now(timezone.utc) - timedelta(minutes=10)
+            self._schedules[run_id] = (time.monotonic(), schedule)
+            self._due[run_id] = time.monotonic()
+            self._wake()
+        return future
+
+    def unwatch(self, run_id: int):
+        """Stop tracking a run."""
+        future = self._waiters.pop(run_id, None)
+        if future is not None and not future.done():
+            future.cancel()
+        self._forget(run_id)
+
+    def _forget(self, run_id: int):
+        self._since.pop(run_id, None)
+        self._last_status.pop(run_id, None)
+        self._schedules.pop(run_id, None)
+        self._due.pop(run_id, None)
+
+    @property
+    def watched(self):
+        return set(self._waiters)
+
+    def start(self):
+        """Start the polling loop on the running event loop."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the polling loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _next_delay(self) -> float:
+        """Seconds until the earliest watched run is due."""
+        now = time.monotonic()
+        due = min(self._due.values())
+        return max(due, self._last_poll + self.min_interval) - now
+
+    def _reschedule(self):
+        now = time.monotonic()
+        for run_id, (watched_at, schedule) in self._schedules.items():
+            interval = self.interval
+            if schedule is not None:
+                try:
+                    interval = schedule(now - watched_at)
+                except Exception as e:
+                    logger.error(f"Poll schedule failed for {run_id}: {e}")
+            self._due[run_id] = now + interval
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._waiters:
+                # Nothing to watch, sleep until a run is registered
+                await self._wakeup.wait()
+                continue
+            delay = self._next_delay()
+            if delay > 0:
+                try:
+                    # A newly watched run may be due earlier, re-evaluate on wakeup
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"Error polling workflow runs: {e}")
+            self._last_poll = time.monotonic()
+            self._reschedule()
+
+    async def poll_once(self):
+        """List recent runs once and dispatch updates to watchers."""
+        if not self._waiters:
+            return
+        pending = set(self._waiters)
+        since = min(self._since[run_id] for run_id in pending)
+        params = {
+            'created': f">={_format_time(since)}",
+            'per_page': self.per_page
+        }
+
+        for page in range(1, self.max_pages + 1):
+            params['page'] = page
+            data = await self.client.get(f"actions/workflows/{self.workflow_file}/runs", params=params)
+            runs = data.get('workflow_runs', [])
+            for run in runs:
+                if run['id'] in pending:
+                    pending.discard(run['id'])
+                    self.dispatch(run)
+            if not pending or len(runs) < self.per_page:
+                break
+
+        # Runs missing from the listing (e.g. beyond max_pages) are fetched directly
+        for run_id in pending:
+            self.dispatch(await self.client.get(f"actions/runs/{run_id}"))
+
+    def dispatch(self, run: dict):
+        """Fan a run update out to listeners and waiters."""
+        run_id = run['id']
+        if run_id not in self._waiters:
+            return
+        if run.get('created_at'):
+            self._since[run_id] = _parse_time(run['created_at'])
+
+        state = (run.get('status'), run.get('conclusion'))
+        if self._last_status.get(run_id) != state:
+            self._last_status[run_id] = state
+            for callback in self._listeners:
+                try:
+                    callback(run)
+                except Exception as e:
+                    logger.error(f"Run listener failed for {run_id}: {e}")
+
+        if run.get('status') == 'completed':
+            future = self._waiters.pop(run_id)
+            self._forget(run_id)
+            if not future.done():
+                future.set_result(run)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Predict the peak disk use of a conversion before it starts
+Sizes come from the ROM zip's central directory and the payload manifest;
+each cleanup strategy is replayed as a timeline of writes and deletes and
+the least destructive one that fits the free space is chosen
+"""
+import os
+import sys
+import json
+import zipfile
+import argparse
+from extraction_plan import (
+    TARGET_PARTITIONS, parse_patterns, plan_extraction, super_partitions,
+)
+from payload_manifest import PAYLOAD_NAME, PayloadError, read_manifest
+from payload_extract import OP_DISCARD, OP_ZERO
+from remote_zip import is_url, open_source
+from stage_files import format_size
+
+# platform-tools download plus its extracted copy (super packages only)
+PLATFORM_TOOLS_BYTES = 100 * 1024 * 1024
+# Small files written next to the images (scripts, README, zip headers)
+PACKAGE_OVERHEAD_BYTES = 16 * 1024 * 1024
+DEFAULT_MARGIN = 1024 * 1024 * 1024
+
+# Cleanup points the converters understand, as environment variables
+CLEANUPS = {
+    'delete_rom': 'DELETE_ROM_AFTER_EXTRACT',
+    'prune_super': 'PRUNE_SUPER_SOURCES',
+}
+
+# Least destructive first; prune_super only applies to the super target
+STRATEGIES = (
+    ('keep', ()),
+    ('delete-rom', ('delete_rom',)),
+    ('prune-super', ('prune_super',)),
+    ('delete-rom+prune-super', ('delete_rom', 'prune_super')),
+)
+
+
+def allocated_size(partition, block_size):
+    """Bytes an extracted image occupies; ZERO/DISCARD blocks stay holes."""
+    holes = sum(count for op in partition.operations if op.type in (OP_ZERO, OP_DISCARD)
+                for _, count in op.dst_extents)
+    return max(0, partition.size - holes * block_size)
+
+
+class Image:
+    """One image the converter extracts: apparent and allocated size."""
+
+    __slots__ = ('name', 'size', 'allocated', 'compressed')
+
+    def __init__(self, name, size, allocated, compressed=None):
+        self.name = name
+        self.size = size
+        self.allocated = allocated
+        # Deflated size estimate for the output zip
+        self.compressed = allocated if compressed is None else compressed
+
+
+def inventory(rom_path, target, allow=None, deny=None):
+    """Images the converter will put on disk, and scratch space it needs."""
+    with open_source(rom_path) as f, zipfile.ZipFile(f) as zf:
+        members = zf.infolist()
+    if not any(info.filename == PAYLOAD_NAME for info in members):
+        # unzip writes every member out in full
+        images = {}
+        extracted = 0
+        for info in members:
+            extracted += info.file_size
+            name, ext = os.path.splitext(os.path.basename(info.filename))
+            if ext == '.img':
+                images[name] = Image(name, info.file_size, info.file_size, info.compress_size)
+        return {'payload': False, 'images': images, 'extracted': extracted, 'scratch': 0,
+                'logical': super_partitions()}
+
+    payload = read_manifest(rom_path)
+    # Deflated payload.bin (no offset to read it in place) is unpacked to a
+    # temporary file first
+    scratch = payload.size if payload.offset is None else 0
+    plan = plan_extraction(payload, target, allow, deny)
+    images = {}
+    for name in plan['extract']:
+        partition = payload.partition(name)
+        images[name] = Image(name, partition.size, allocated_size(partition, payload.block_size))
+    return {'payload': True, 'images': images, 'extracted': sum(i.allocated for i in images.values()),
+            'scratch': scratch, 'logical': super_partitions(payload)}
+
+
+def timeline(rom, target, cleanups, copy_staging=False):
+    """(step, bytes) disk usage changes of one conversion, in order."""
+    images = rom['images']
+    super_image = images.get('super')
+    logical = [images[name] for name in rom['logical'] if name in images]
+    if target == 'hybrid':
+        packed = [i for name, i in images.items() if name in TARGET_PARTITIONS['hybrid']]
+    else:
+        packed = [i for name, i in images.items() if name != 'super']
+
+    steps = []
+    if rom['scratch']:
+        steps.append(('unpack payload.bin', rom['scratch']))
+    steps.append(('extract images', rom['extracted']))
+    if rom['scratch']:
+        steps.append(('remove payload.bin', -rom['scratch']))
+    if 'delete_rom' in cleanups:
+        steps.append(('delete ROM zip', -rom['rom_size']))
+
+    if target == 'super':
+        if super_image:
+            # Logical partitions are copied straight out of super.img
+            sources = 0
+        else:
+            sources = sum(i.allocated for i in logical)
+            steps.append(('stage logical images', sources if copy_staging else 0))
+        # Written sparse, so only the data counts
+        built = super_image.allocated if super_image else sum(i.allocated for i in logical)
+        steps.append(('build super.img', built))
+        if 'prune_super' in cleanups:
+            # Logical images are only a fallback once super.img exists
+            pruned = sources + (super_image.allocated if super_image else 0)
+            if not super_image and copy_staging:
+                pruned += sources
+            steps.append(('prune super sources', -pruned))
+            packed = [i for i in packed if i not in logical]
+        steps.append(('platform tools', PLATFORM_TOOLS_BYTES))
+        output = built + sum(i.compressed for i in packed) + PLATFORM_TOOLS_BYTES
+    elif target == 'hybrid':
+        output = sum(i.compressed for i in packed)
+        if super_image:
+            output += super_image.compressed
+    else:
+        # Stored, so zero runs take their full size; super.img is packed
+        # as well as the logical partitions streamed out of it
+        output = sum(i.size for i in packed)
+        if super_image:
+            output += 2 * super_image.size
+    steps.append(('write zip', output + PACKAGE_OVERHEAD_BYTES))
+    return steps
+
+
+def peak(steps):
+    used = 0
+    highest = 0
+    highest_step = None
+    for step, change in steps:
+        used += change
+        if used > highest:
+            highest = used
+            highest_step = step
+    return highest, highest_step
+
+
+def plan_budget(rom_path, target, free, margin=DEFAULT_MARGIN, allow=None, deny=None, copy_staging=False):
+    """Peak use of each strategy and the first one that fits in free - margin."""
+    rom = inventory(rom_path, target, allow, deny)
+    # A ROM read from its URL takes no local space
+    rom['rom_size'] = 0 if is_url(rom_path) else os.path.getsize(rom_path)
+    available = free - margin
+    strategies = []
+    chosen = None
+    for name, cleanups in STRATEGIES:
+        if 'prune_super' in cleanups and target != 'super':
+            continue
+        steps = timeline(rom, target, cleanups, copy_staging)
+        need, step = peak(steps)
+        fits = need <= available
+        strategies.append({'name': name, 'cleanups': list(cleanups), 'peak': need, 'peak_step': step,
+                           'fits': fits, 'steps': steps})
+        if fits and chosen is None:
+            chosen = strategies[-1]
+    return {
+        'target': target,
+        'payload': rom['payload'],
+        'rom_size': rom['rom_size'],
+        'free': free,
+        'margin': margin,
+        'strategies': strategies,
+        'chosen': chosen['name'] if chosen else None,
+        'env': {CLEANUPS[c]: '1' for c in chosen['cleanups']} if chosen else {},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a conversion fits on disk and pick cleanup points")
+    parser.add_argument('rom', help="ROM zip (path or http(s) URL)")
+    parser.add_argument('target', choices=sorted(TARGET_PARTITIONS))
+    parser.add_argument('--path', default='.', help="Directory on the filesystem the conversion writes to")
+    parser.add_argument('--free', type=int, help="Free bytes to plan for (default: free space at --path)")
+    parser.add_argument('--margin', type=int, default=DEFAULT_MARGIN, help="Bytes to keep free")
+    parser.add_argument('--allow', help="Extra partitions to extract (comma separated, globs allowed)")
+    parser.add_argument('--deny', help="Partitions never to extract (comma separated, globs allowed)")
+    parser.add_argument('--copy-staging', action='store_true', help="Plan for staging by copy instead of hardlinks")
+    parser.add_argument('--github-env', help="Append the chosen cleanup variables to this file ($GITHUB_ENV)")
+    parser.add_argument('--json', action='store_true', help="Print the full plan as JSON")
+    args = parser.parse_args()
+
+    try:
+        if args.free is None:
+            st = os.statvfs(args.path)
+            args.free = st.f_bavail * st.f_frsize
+        budget = plan_budget(args.rom, args.target, args.free, args.margin, parse_patterns(args.allow),
+                             parse_patterns(args.deny), args.copy_staging)
+    except (OSError, zipfile.BadZipFile, PayloadError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(budget, indent=2))
+    else:
+        print(f"Free space: {format_size(budget['free'])} (keeping {format_size(budget['margin'])} spare)")
+        for strategy in budget['strategies']:
+            mark = 'fits' if strategy['fits'] else 'too big'
+            print(f"  {strategy['name']}: peak {format_size(strategy['peak'])} "
+                  f"during '{strategy['peak_step']}' ({mark})")
+
+    if budget['chosen'] is None:
+        best = min(budget['strategies'], key=lambda s: s['peak'])
+        print(f"Error: not enough disk space, {budget['target']} conversion needs at least "
+              f"{format_size(best['peak'] + budget['margin'])}, {format_size(budget['free'])} free",
+              file=sys.stderr)
+        sys.exit(1)
+    print(f"Using strategy: {budget['chosen']}", file=sys.stderr if args.json else sys.stdout)
+    if args.github_env:
+        with open(args.github_env, 'a') as f:
+            for key, value in budget['env'].items():
+                f.write(f"{key}={value}\n")
+
+if __name__ == '__main__':
+    main()
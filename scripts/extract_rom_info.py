@@ -1,12 +1,153 @@
 #!/usr/bin/env python3
 """
 Extract ROM metadata (codename, version) from ROM files
-Simplified version with random filename generation
+Reads OTA metadata, payload properties and build.prop straight from the
+zip central directory without extracting the archive
 """
 import sys
 import os
+import re
 import json
-from datetime import datetime
+import zipfile
+from datetime import datetime, timezone
+from payload_manifest import PAYLOAD_NAME, PayloadError, read_manifest
+from remote_zip import is_url, open_source
+
+METADATA_PATH = 'META-INF/com/android/metadata'
+PAYLOAD_PROPERTIES_PATH = 'payload_properties.txt'
+BUILD_PROP_PATHS = [
+    'system/build.prop',
+    'system/system/build.prop',
+    'vendor/build.prop',
+    'product/build.prop',
+    'system_ext/build.prop',
+]
+
+
+def parse_properties(text):
+    """Parse key=value lines (build.prop / OTA metadata format)."""
+    props = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#') or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        props[key.strip()] = value.strip()
+    return props
+
+
+def read_member(zf, name, max_size=1024 * 1024):
+    """Read a small zip member by name, None if absent or oversized."""
+    try:
+        info = zf.getinfo(name)
+    except KeyError:
+        return None
+    if info.file_size > max_size:
+        return None
+    return zf.read(info).decode('utf-8', errors='replace')
+
+
+def parse_fingerprint(fingerprint):
+    """Split brand/product/device:release/id/incremental:type/tags."""
+    match = re.match(r'^([^/]+)/([^/]+)/([^:]+):([^/]+)/([^/]+)/([^:]+):([^/]+)/(.+)$', fingerprint or '')
+    if not match:
+        return {}
+    keys = ('brand', 'product', 'device', 'release', 'id', 'incremental', 'type', 'tags')
+    return dict(zip(keys, match.groups()))
+
+
+def read_rom_metadata(rom_path):
+    """Collect OTA metadata, payload properties and build.prop values from a ROM zip."""
+    sources = {'metadata': {}, 'payload_properties': {}, 'build_prop': {}}
+    # ZipFile only parses the central directory; members are read on demand
+    # (over range requests when the ROM is a URL)
+    with open_source(rom_path) as f:
+        if not zipfile.is_zipfile(f):
+            return sources
+        zf = zipfile.ZipFile(f)
+        text = read_member(zf, METADATA_PATH)
+        if text:
+            sources['metadata'] = parse_properties(text)
+        text = read_member(zf, PAYLOAD_PROPERTIES_PATH)
+        if text:
+            sources['payload_properties'] = parse_properties(text)
+        for path in BUILD_PROP_PATHS:
+            text = read_member(zf, path)
+            if text:
+                # Earlier (system) props win over later partitions
+                for key, value in parse_properties(text).items():
+                    sources['build_prop'].setdefault(key, value)
+    return sources
+
+
+def read_partition_inventory(rom_path):
+    """Partition list from the payload manifest, None if the ROM has no payload."""
+    with open_source(rom_path) as f:
+        if not zipfile.is_zipfile(f):
+            return None
+        if PAYLOAD_NAME not in zipfile.ZipFile(f).namelist():
+            return None
+    return read_manifest(rom_path).to_dict()
+
+
+def build_metadata(sources):
+    """Derive the metadata fields used for naming and routing."""
+    ota = sources['metadata']
+    props = sources['build_prop']
+
+    fingerprint = (
+        props.get('ro.build.fingerprint')
+        or props.get('ro.system.build.fingerprint')
+        or ota.get('post-build', '').split('|')[0]
+        or 'unknown'
+    )
+    fp = parse_fingerprint(fingerprint)
+
+    codename = (
+        props.get('ro.product.device')
+        or props.get('ro.product.system.device')
+        or ota.get('pre-device', '').split(',')[0]
+        or fp.get('device')
+        or 'rom'
+    )
+
+    version = (
+        props.get('ro.build.display.id')
+        or ota.get('post-build-incremental')
+        or props.get('ro.build.version.incremental')
+        or fp.get('incremental')
+        or datetime.now().strftime("%Y%m%d")
+    )
+
+    timestamp = ota.get('post-timestamp') or props.get('ro.build.date.utc')
+    if timestamp and timestamp.isdigit():
+        build_date = datetime.fromtimestamp(int(timestamp), tz=timezone.utc).strftime("%Y-%m-%d")
+    else:
+        build_date = datetime.now().strftime("%Y-%m-%d")
+
+    return {
+        'codename': codename,
+        'version': version,
+        'android_version': props.get('ro.build.version.release') or fp.get('release') or 'unknown',
+        'sdk_version': props.get('ro.build.version.sdk') or ota.get('post-sdk-level') or 'unknown',
+        'security_patch': (
+            props.get('ro.build.version.security_patch')
+            or ota.get('post-security-patch-level')
+            or 'unknown'
+        ),
+        'build_date': build_date,
+        'fingerprint': fingerprint,
+        'ota_type': ota.get('ota-type', 'unknown'),
+        'payload_size': sources['payload_properties'].get('FILE_SIZE'),
+        'payload_hash': sources['payload_properties'].get('FILE_HASH'),
+    }
+
+
+def sanitize(value):
+    """Make a metadata value safe for use in a filename."""
+    value = re.sub(r'\(.*?\)', '', value)
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', value).strip('._-')
+
 
 def generate_random_filename(rom_type):
     """Generate filename with timestamp"""
@@ -14,34 +155,48 @@ def generate_random_filename(rom_type):
     filename = f"rom-{timestamp}-{rom_type}.zip"
     return filename
 
+
+def generate_filename(metadata, rom_type):
+    """codename-version-romtype.zip, timestamp name if metadata is missing"""
+    if metadata['codename'] == 'rom':
+        return generate_random_filename(rom_type)
+    codename = sanitize(metadata['codename']).upper()
+    version = sanitize(metadata['version'])
+    # Display IDs often repeat the codename (e.g. PKG110_16.0.0.205)
+    if version.upper().startswith(codename + '_'):
+        version = version[len(codename) + 1:]
+    return f"{codename}-{version}-{rom_type}.zip"
+
+
 def main():
     if len(sys.argv) < 3:
         print("Usage: extract_rom_info.py <rom_path> <rom_type>")
         sys.exit(1)
-    
+
     rom_path = sys.argv[1]
     rom_type = sys.argv[2]
-    
-    if not os.path.exists(rom_path):
+
+    if not is_url(rom_path) and not os.path.exists(rom_path):
         print(f"Error: ROM file not found: {rom_path}", file=sys.stderr)
         sys.exit(1)
-    
-    # Generate random filename
-    filename = generate_random_filename(rom_type)
-    
+
+    metadata = build_metadata(read_rom_metadata(rom_path))
+    filename = generate_filename(metadata, rom_type)
+
+    # Reject broken payloads before anything gets extracted
+    try:
+        payload = read_partition_inventory(rom_path)
+    except PayloadError as e:
+        print(f"Error: invalid payload: {e}", file=sys.stderr)
+        sys.exit(1)
+
     # Output as JSON
     output = {
-        'metadata': {
-            'codename': 'rom',
-            'version': datetime.now().strftime("%Y%m%d"),
-            'android_version': 'unknown',
-            'sdk_version': 'unknown',
-            'build_date': datetime.now().strftime("%Y-%m-%d"),
-            'fingerprint': 'unknown'
-        },
-        'filename': filename
+        'metadata': metadata,
+        'filename': filename,
+        'payload': payload
     }
-    
+
     print(json.dumps(output, indent=2))
 
 if __name__ == '__main__':
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Decide which payload partitions a conversion target actually uses
+Partitions the output never flashes are skipped before extraction
+"""
+import sys
+import json
+import argparse
+from fnmatch import fnmatch
+from payload_manifest import PayloadError, read_manifest
+
+# Partitions flash-all.bat flashes directly (keep in sync with templates/super/flash-all.bat)
+SUPER_PHYSICAL_PARTITIONS = (
+    'boot', 'dtbo', 'vbmeta', 'vendor_boot', 'init_boot', 'recovery', 'abl', 'aop',
+    'aop_config', 'bluetooth', 'cpucp', 'devcfg', 'dsp', 'engineering_cdt', 'featenabler',
+    'hyp', 'imagefv', 'keymaster', 'modem', 'oplus_sec', 'oplusstanvbk', 'qupfw', 'shrm',
+    'splash', 'tz', 'uefi', 'uefisecapp', 'cpucp_dtb', 'vbmeta_vendor', 'xbl', 'xbl_config',
+    'xbl_ramdump',
+)
+
+# Partitions packed into super.img, or flashed in fastbootd without it
+SUPER_LOGICAL_PARTITIONS = (
+    'system', 'system_ext', 'product', 'vendor', 'odm', 'system_dlkm', 'vendor_dlkm',
+    'my_product', 'my_engineering', 'my_stock', 'my_carrier', 'my_region', 'my_bigball',
+    'my_heytap', 'my_manifest',
+)
+
+# Images the hybrid installer flashes (keep in sync with templates/hybrid/META-INF)
+HYBRID_PARTITIONS = (
+    'boot', 'system', 'vendor', 'product', 'system_ext', 'odm', 'dtbo', 'vbmeta',
+    'vendor_boot', 'recovery',
+)
+
+# None = every partition (the recovery installer flashes whatever it finds)
+TARGET_PARTITIONS = {
+    'super': SUPER_PHYSICAL_PARTITIONS + SUPER_LOGICAL_PARTITIONS,
+    'hybrid': HYBRID_PARTITIONS,
+    'recovery': None,
+}
+
+
+def parse_patterns(value):
+    """Split a comma/space separated pattern list."""
+    return [p for p in (value or '').replace(',', ' ').split() if p]
+
+
+def matches(name, patterns):
+    return any(fnmatch(name, pattern) for pattern in patterns)
+
+
+def super_partitions(payload=None):
+    """Partitions that go into super.img: the payload's dynamic groups when
+    it has them, otherwise the usual logical partition names."""
+    if payload is not None and payload.dynamic_groups:
+        return [name for group in payload.dynamic_groups for name in group['partitions']]
+    return list(SUPER_LOGICAL_PARTITIONS)
+
+
+def target_wants(payload, target, name):
+    """True if the target output uses the named partition."""
+    if target not in TARGET_PARTITIONS:
+        raise ValueError(f"Unknown target '{target}', expected one of: {', '.join(TARGET_PARTITIONS)}")
+    wanted = TARGET_PARTITIONS[target]
+    if wanted is None or name in wanted:
+        return True
+    # Everything in the payload's dynamic groups ends up in super.img
+    if target == 'super':
+        return name in super_partitions(payload)
+    return False
+
+
+def plan_extraction(payload, target, allow=None, deny=None):
+    """Split payload partitions into extract/skip lists for a target.
+
+    ``allow`` patterns add partitions the target would not use, ``deny``
+    patterns drop partitions it would; deny wins over allow.
+    """
+    allow = allow or []
+    deny = deny or []
+    extract = []
+    skip = []
+    for partition in payload.partitions:
+        wanted = target_wants(payload, target, partition.name) or matches(partition.name, allow)
+        if wanted and not matches(partition.name, deny):
+            extract.append(partition)
+        else:
+            skip.append(partition)
+    return {
+        'target': target,
+        'extract': [p.name for p in extract],
+        'skip': [p.name for p in skip],
+        'extract_bytes': sum(p.size for p in extract),
+        'skip_bytes': sum(p.size for p in skip),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan which payload partitions a target needs")
+    parser.add_argument('payload', help="ROM zip containing payload.bin, or payload.bin itself")
+    parser.add_argument('target', choices=sorted(TARGET_PARTITIONS))
+    parser.add_argument('--allow', help="Extra partitions to extract (comma separated, globs allowed)")
+    parser.add_argument('--deny', help="Partitions never to extract (comma separated, globs allowed)")
+    parser.add_argument('--names', action='store_true', help="Only print the comma separated partition list")
+    args = parser.parse_args()
+
+    try:
+        payload = read_manifest(args.payload)
+    except (OSError, PayloadError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    plan = plan_extraction(payload, args.target, parse_patterns(args.allow), parse_patterns(args.deny))
+    if args.names:
+        print(','.join(plan['extract']))
+    else:
+        print(json.dumps(plan, indent=2))
+
+if __name__ == '__main__':
+    main()
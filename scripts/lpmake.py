@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Build super.img from partition images without lpmake
+Lays out every dynamic partition on aligned extents, writes LP metadata for
+all slots and streams the images into place in one sequential pass,
+optionally straight to Android sparse format
+"""
+import os
+import sys
+import hashlib
+import argparse
+from lpunpack import (
+    BLOCK_DEVICE_ENTRY, EXTENT_ENTRY, GEOMETRY, GROUP_ENTRY, HEADER, LP_METADATA_GEOMETRY_MAGIC,
+    LP_METADATA_GEOMETRY_SIZE, LP_METADATA_HEADER_MAGIC, LP_METADATA_MAJOR_VERSION,
+    LP_PARTITION_ATTR_READONLY, LP_PARTITION_RESERVED_BYTES, LP_SECTOR_SIZE, LP_TARGET_TYPE_LINEAR,
+    PARTITION_ENTRY, LpError,
+)
+from sparse_image import SparseError, SparseWriter, copy_segments, open_image
+
+DEFAULT_METADATA_SIZE = 65536
+DEFAULT_METADATA_SLOTS = 2
+DEFAULT_ALIGNMENT = 1024 * 1024
+DEFAULT_BLOCK_SIZE = 4096
+# Free space left in an auto-sized super partition
+AUTO_SIZE_HEADROOM = 0.10
+
+
+def align(value, alignment):
+    return (value + alignment - 1) // alignment * alignment
+
+
+def _checksummed(raw, start):
+    """Fill the 32 byte SHA-256 field at start with the checksum of raw."""
+    raw = bytearray(raw)
+    raw[start:start + 32] = hashlib.sha256(raw).digest()
+    return bytes(raw)
+
+
+class Layout:
+    """Where everything goes in the super partition.
+
+    ``images`` are (name, image) or (name, image, group) tuples; partitions
+    without a group go to ``group``. ``group_sizes`` gives a group's maximum
+    size (e.g. from the payload manifest), other groups get ``group_size``,
+    by default the whole super partition, or half of it per slot with ``ab``.
+    An auto-sized device grows to hold every explicit maximum.
+    """
+
+    def __init__(self, images, device_size=None, group='main', group_size=None, ab=False, group_sizes=None,
+                 metadata_size=DEFAULT_METADATA_SIZE, metadata_slots=DEFAULT_METADATA_SLOTS,
+                 alignment=DEFAULT_ALIGNMENT, block_size=DEFAULT_BLOCK_SIZE, super_name='super'):
+        if metadata_size % LP_SECTOR_SIZE:
+            raise LpError("Metadata size must be a multiple of 512")
+        if alignment % block_size:
+            raise LpError("Alignment must be a multiple of the block size")
+        self.metadata_size = metadata_size
+        self.metadata_slots = metadata_slots
+        self.alignment = alignment
+        self.block_size = block_size
+        self.super_name = super_name
+
+        reserved = LP_PARTITION_RESERVED_BYTES + 2 * (LP_METADATA_GEOMETRY_SIZE + metadata_slots * metadata_size)
+        self.first_data_offset = align(reserved, alignment)
+
+        # (name, group, image or None, offset, size)
+        group_sizes = group_sizes or {}
+        self.partitions = []
+        # Group names in order of first use, before any slot suffix
+        base_groups = []
+        offset = self.first_data_offset
+        for name, image, *image_group in images:
+            base = image_group[0] if image_group and image_group[0] else group
+            if base not in base_groups:
+                base_groups.append(base)
+            size = align(image.size, block_size)
+            if ab and not name.endswith(('_a', '_b')):
+                self.partitions.append((f"{name}_a", f"{base}_a", image, offset, size))
+                self.partitions.append((f"{name}_b", f"{base}_b", None, 0, 0))
+            else:
+                self.partitions.append((name, base, image, offset, size))
+            offset = align(offset + size, alignment)
+        self.data_end = offset
+
+        used = sum(size for _, _, _, _, size in self.partitions)
+        # Explicit group maxima, once per slot, all have to fit in the device
+        declared = sum(group_sizes.get(base) or 0 for base in base_groups) * (2 if ab else 1)
+        if device_size is None:
+            needed = self.data_end + int(used * AUTO_SIZE_HEADROOM)
+            if ab and group_size is None and any(base not in group_sizes for base in base_groups):
+                # Unsized groups get half the device per slot, so leave room for that
+                needed = max(needed, self.first_data_offset + 2 * (used + int(used * AUTO_SIZE_HEADROOM)))
+            needed = max(needed, self.first_data_offset + declared)
+            device_size = align(needed, alignment)
+        if device_size < self.data_end:
+            raise LpError(f"Partitions need {self.data_end} bytes, super is only {device_size}")
+        self.device_size = device_size
+
+        usable = device_size - self.first_data_offset
+        if declared > usable:
+            raise LpError(f"Group maximums need {declared} bytes, super only has {usable} usable")
+        if group_size is None:
+            # Both slots' groups have to fit in the device together
+            group_size = usable // 2 // block_size * block_size if ab else usable
+        self.groups = [('default', 0)]
+        for base in base_groups:
+            maximum = group_sizes.get(base) or group_size
+            for name in ([f"{base}_a", f"{base}_b"] if ab else [base]):
+                total = sum(size for _, g, _, _, size in self.partitions if g == name)
+                if total > maximum:
+                    raise LpError(f"Group {name} needs {total} bytes, maximum is {maximum}")
+                self.groups.append((name, maximum))
+
+    def geometry(self):
+        raw = GEOMETRY.pack(LP_METADATA_GEOMETRY_MAGIC, GEOMETRY.size, bytes(32),
+                            self.metadata_size, self.metadata_slots, self.block_size)
+        return _checksummed(raw, 8)
+
+    def metadata(self):
+        """Header plus tables for one metadata slot."""
+        group_index = {name: index for index, (name, _) in enumerate(self.groups)}
+        partitions = []
+        extents = []
+        for name, group, image, offset, size in self.partitions:
+            first_extent = len(extents)
+            if size:
+                extents.append(EXTENT_ENTRY.pack(size // LP_SECTOR_SIZE, LP_TARGET_TYPE_LINEAR,
+                                                 offset // LP_SECTOR_SIZE, 0))
+            partitions.append(PARTITION_ENTRY.pack(name.encode(), LP_PARTITION_ATTR_READONLY, first_extent,
+                                                   len(extents) - first_extent, group_index[group]))
+        groups = [GROUP_ENTRY.pack(name.encode(), 0, size) for name, size in self.groups]
+        block_devices = [BLOCK_DEVICE_ENTRY.pack(self.first_data_offset // LP_SECTOR_SIZE, self.alignment, 0,
+                                                 self.device_size, self.super_name.encode(), 0)]
+
+        tables = b''
+        descriptors = []
+        for entries, entry in ((partitions, PARTITION_ENTRY), (extents, EXTENT_ENTRY),
+                               (groups, GROUP_ENTRY), (block_devices, BLOCK_DEVICE_ENTRY)):
+            descriptors += [len(tables), len(entries), entry.size]
+            tables += b''.join(entries)
+
+        header = HEADER.pack(LP_METADATA_HEADER_MAGIC, LP_METADATA_MAJOR_VERSION, 0, HEADER.size, bytes(32),
+                             len(tables), hashlib.sha256(tables).digest(), *descriptors)
+        metadata = _checksummed(header, 12) + tables
+        if len(metadata) > self.metadata_size:
+            raise LpError(f"LP metadata needs {len(metadata)} bytes, metadata size is {self.metadata_size}")
+        return metadata
+
+    def reserved_area(self):
+        """Everything before the first partition, up to the end of the backup metadata."""
+        geometry = self.geometry().ljust(LP_METADATA_GEOMETRY_SIZE, b'\0')
+        metadata = self.metadata().ljust(self.metadata_size, b'\0')
+        # Primary geometry + backup, then primary slots + backup slots
+        return (bytes(LP_PARTITION_RESERVED_BYTES) + geometry * 2
+                + metadata * (2 * self.metadata_slots))
+
+
+def build_super(images, output, sparse=False, log=print, **layout_options):
+    """Write a super image from [(name, source)] or [(name, source, group)] in one sequential pass.
+
+    A source is an image path or an open view with ``path``, ``size`` and
+    ``segments()`` such as an lpunpack.LogicalPartition, which is copied
+    straight from its backing file.
+    """
+    opened = [(name, open_image(source) if isinstance(source, str) else source, *group)
+              for name, source, *group in images]
+    try:
+        layout = Layout(opened, **layout_options)
+        for name, _, image, offset, size in layout.partitions:
+            if image is not None:
+                log(f"  {name}: {size} bytes at {offset}")
+        reserved = layout.reserved_area()
+        if sparse:
+            _write_sparse(layout, reserved, output)
+        else:
+            _write_raw(layout, reserved, output)
+    finally:
+        for (_, source, *_), (_, image, *_) in zip(images, opened):
+            if isinstance(source, str):
+                image.close()
+    log(f"Super image: {layout.device_size} bytes, {len(opened)} partitions, {layout.metadata_slots} metadata slots")
+    return layout
+
+
+def _write_raw(layout, reserved, output):
+    dst = os.open(output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.pwrite(dst, reserved, 0)
+        for _, _, image, offset, _ in layout.partitions:
+            if image is None:
+                continue
+            src = os.open(image.path, os.O_RDONLY)
+            try:
+                copy_segments(src, image.segments(), dst, offset)
+            finally:
+                os.close(src)
+        # Padding and free space stay holes
+        os.ftruncate(dst, layout.device_size)
+    finally:
+        os.close(dst)
+
+
+def _write_sparse(layout, reserved, output):
+    with SparseWriter(output, layout.block_size) as writer:
+        writer.data(reserved)
+        for _, _, image, offset, _ in sorted(layout.partitions, key=lambda p: p[3]):
+            if image is None:
+                continue
+            writer.skip(offset - writer.size)
+            src = os.open(image.path, os.O_RDONLY)
+            try:
+                writer.segments(src, image.segments())
+            finally:
+                os.close(src)
+        writer.skip(layout.device_size - writer.size)
+
+
+def parse_size(value):
+    """Byte count with an optional K/M/G suffix; 'auto' means None."""
+    if value in (None, '', 'auto'):
+        return None
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    suffix = value[-1].upper()
+    if suffix in units:
+        return int(value[:-1]) * units[suffix]
+    return int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build super.img from partition images")
+    parser.add_argument('output')
+    parser.add_argument('images', nargs='+', help="Partition images; name defaults to the file name (NAME=PATH to override)")
+    parser.add_argument('--device-size', default='auto', help="Super partition size (default: images + 10%%)")
+    parser.add_argument('--group', default='main', help="Partition group name")
+    parser.add_argument('--group-size', default='auto', help="Group maximum size (default: whole super, half of it with --ab)")
+    parser.add_argument('--ab', action='store_true', help="Name partitions <name>_a and add empty _b partitions")
+    parser.add_argument('--metadata-size', type=int, default=DEFAULT_METADATA_SIZE)
+    parser.add_argument('--metadata-slots', type=int, default=DEFAULT_METADATA_SLOTS)
+    parser.add_argument('--alignment', type=int, default=DEFAULT_ALIGNMENT)
+    parser.add_argument('--sparse', action='store_true', help="Write Android sparse format")
+    args = parser.parse_args()
+
+    images = []
+    for item in args.images:
+        if '=' in item:
+            name, path = item.split('=', 1)
+        else:
+            name, path = os.path.splitext(os.path.basename(item))[0], item
+        images.append((name, path))
+
+    try:
+        build_super(
+            images, args.output, sparse=args.sparse,
+            device_size=parse_size(args.device_size), group=args.group,
+            group_size=parse_size(args.group_size), ab=args.ab,
+            metadata_size=args.metadata_size, metadata_slots=args.metadata_slots,
+            alignment=args.alignment,
+        )
+    except (OSError, ValueError, LpError, SparseError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
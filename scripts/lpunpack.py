@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Read logical partitions from super.img (raw or sparse) without lpunpack
+Parses the LP metadata (geometry, header, partition/extent/group tables) and
+exposes each partition as a lazy view over the image's own bytes
+"""
+import io
+import os
+import sys
+import json
+import struct
+import hashlib
+import argparse
+from sparse_image import ZERO, ImageStream, SparseError, open_image, segment_bytes, write_segments
+
+LP_PARTITION_RESERVED_BYTES = 4096
+LP_METADATA_GEOMETRY_SIZE = 4096
+LP_METADATA_GEOMETRY_MAGIC = 0x616c4467
+LP_METADATA_HEADER_MAGIC = 0x414c5030
+LP_METADATA_MAJOR_VERSION = 10
+LP_SECTOR_SIZE = 512
+
+LP_PARTITION_ATTR_READONLY = 1 << 0
+LP_PARTITION_ATTR_SLOT_SUFFIXED = 1 << 1
+LP_PARTITION_ATTR_UPDATED = 1 << 2
+LP_PARTITION_ATTR_DISABLED = 1 << 3
+
+LP_TARGET_TYPE_LINEAR = 0
+LP_TARGET_TYPE_ZERO = 1
+
+GEOMETRY = struct.Struct('<II32sIII')
+# magic, major, minor, header_size, header checksum, tables_size, tables checksum,
+# then (offset, num_entries, entry_size) for partitions, extents, groups, block devices
+HEADER = struct.Struct('<IHHI32sI32s12I')
+HEADER_V1_2_SIZE = 256
+PARTITION_ENTRY = struct.Struct('<36sIIII')
+EXTENT_ENTRY = struct.Struct('<QIQI')
+GROUP_ENTRY = struct.Struct('<36sIQ')
+BLOCK_DEVICE_ENTRY = struct.Struct('<QIIQ36sI')
+
+
+class LpError(Exception):
+    """Raised for missing or corrupt LP metadata."""
+
+
+def _name(raw):
+    return raw.split(b'\0', 1)[0].decode()
+
+
+class Geometry:
+    def __init__(self, raw):
+        magic, struct_size, checksum, self.metadata_max_size, self.metadata_slot_count, \
+            self.logical_block_size = GEOMETRY.unpack_from(raw)
+        if magic != LP_METADATA_GEOMETRY_MAGIC:
+            raise LpError("Bad LP geometry magic")
+        body = bytearray(raw[:struct_size])
+        body[8:40] = bytes(32)
+        if hashlib.sha256(body).digest() != checksum:
+            raise LpError("LP geometry checksum mismatch")
+
+
+class LogicalPartition:
+    """One logical partition: a lazy view over its extents in super.img.
+
+    Nothing is copied until ``read``/``write_to`` is called; ``segments``
+    describes the content as ranges of the backing file for streaming.
+    """
+
+    def __init__(self, image, name, attributes, group, extents):
+        self.image = image
+        # Segments are ranges of this file, so lpmake can copy from it directly
+        self.path = image.path
+        self.name = name
+        self.attributes = attributes
+        self.group = group
+        # (type, length in bytes, physical byte offset)
+        self.extents = extents
+        self.size = sum(length for _, length, _ in extents)
+
+    @property
+    def readonly(self):
+        return bool(self.attributes & LP_PARTITION_ATTR_READONLY)
+
+    def segments(self, offset=0, length=None):
+        """Content as ('data'|'fill'|'zero', length, value) segments."""
+        if length is None:
+            length = self.size - offset
+        end = offset + length
+        pos = 0
+        for target_type, size, physical in self.extents:
+            lo = max(offset, pos)
+            hi = min(end, pos + size)
+            if lo < hi:
+                if target_type == LP_TARGET_TYPE_ZERO:
+                    yield ZERO, hi - lo, None
+                else:
+                    yield from self.image.segments(physical + lo - pos, hi - lo)
+            pos += size
+            if pos >= end:
+                break
+
+    def read(self, offset, length):
+        return b''.join(segment_bytes(self.image.map, *segment) for segment in self.segments(offset, length))
+
+    def stream(self):
+        """Seekable file object over the partition content."""
+        return io.BufferedReader(ImageStream(self), 8 * 1024 * 1024)
+
+    def write_to(self, path):
+        """Materialize as a raw image (holes for zero runs)."""
+        return write_segments(self.image.path, self.segments(), path)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'group': self.group,
+            'size': self.size,
+            'readonly': self.readonly,
+            'extents': len(self.extents),
+        }
+
+
+class SuperImage:
+    """Parsed LP metadata of a super image (one metadata slot)."""
+
+    def __init__(self, path, slot=0):
+        self.image = open_image(path)
+        self.path = path
+        try:
+            self.geometry = self._read_geometry()
+            if slot >= self.geometry.metadata_slot_count:
+                raise LpError(f"Metadata slot {slot} out of range")
+            self._read_metadata(slot)
+        except (SparseError, struct.error) as e:
+            self.image.close()
+            raise LpError(f"Corrupt super image: {e}")
+
+    def close(self):
+        self.image.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_geometry(self):
+        # Primary copy first, backup right after it
+        error = None
+        for copy in range(2):
+            raw = self.image.read(LP_PARTITION_RESERVED_BYTES + copy * LP_METADATA_GEOMETRY_SIZE, GEOMETRY.size)
+            try:
+                return Geometry(raw)
+            except LpError as e:
+                error = e
+        raise error
+
+    def _metadata_offsets(self, slot):
+        base = LP_PARTITION_RESERVED_BYTES + 2 * LP_METADATA_GEOMETRY_SIZE
+        primary = base + slot * self.geometry.metadata_max_size
+        backup = base + (self.geometry.metadata_slot_count + slot) * self.geometry.metadata_max_size
+        return primary, backup
+
+    def _read_metadata(self, slot):
+        error = None
+        for offset in self._metadata_offsets(slot):
+            try:
+                self._parse_metadata(offset)
+                return
+            except LpError as e:
+                error = e
+        raise error
+
+    def _parse_metadata(self, offset):
+        raw = self.image.read(offset, HEADER.size)
+        fields = HEADER.unpack(raw)
+        magic, major, minor, header_size, header_checksum, tables_size, tables_checksum = fields[:7]
+        descriptors = fields[7:]
+        if magic != LP_METADATA_HEADER_MAGIC:
+            raise LpError("Bad LP metadata header magic")
+        if major != LP_METADATA_MAJOR_VERSION:
+            raise LpError(f"Unsupported LP metadata version {major}.{minor}")
+
+        header = bytearray(self.image.read(offset, header_size))
+        header[12:44] = bytes(32)
+        if hashlib.sha256(header).digest() != header_checksum:
+            raise LpError("LP metadata header checksum mismatch")
+        tables = self.image.read(offset + header_size, tables_size)
+        if hashlib.sha256(tables).digest() != tables_checksum:
+            raise LpError("LP metadata tables checksum mismatch")
+
+        self.version = (major, minor)
+        self.flags = struct.unpack_from('<I', header, HEADER.size)[0] if header_size >= HEADER_V1_2_SIZE else 0
+
+        def table(index, entry):
+            table_offset, count, entry_size = descriptors[index * 3:index * 3 + 3]
+            if entry_size < entry.size:
+                raise LpError("LP table entries smaller than expected")
+            return [entry.unpack_from(tables, table_offset + i * entry_size) for i in range(count)]
+
+        raw_partitions = table(0, PARTITION_ENTRY)
+        raw_extents = table(1, EXTENT_ENTRY)
+        self.groups = [
+            {'name': _name(name), 'flags': flags, 'maximum_size': maximum_size}
+            for name, flags, maximum_size in table(2, GROUP_ENTRY)
+        ]
+        self.block_devices = [
+            {'name': _name(name), 'first_logical_sector': first, 'alignment': alignment,
+             'alignment_offset': alignment_offset, 'size': size, 'flags': flags}
+            for first, alignment, alignment_offset, size, name, flags in table(3, BLOCK_DEVICE_ENTRY)
+        ]
+
+        self.partitions = []
+        for name, attributes, first_extent, num_extents, group_index in raw_partitions:
+            extents = []
+            for num_sectors, target_type, target_data, target_source in raw_extents[first_extent:first_extent + num_extents]:
+                if target_type == LP_TARGET_TYPE_LINEAR and target_source != 0:
+                    raise LpError("Partitions spanning several block devices are not supported")
+                extents.append((target_type, num_sectors * LP_SECTOR_SIZE, target_data * LP_SECTOR_SIZE))
+            group = self.groups[group_index]['name'] if group_index < len(self.groups) else None
+            self.partitions.append(LogicalPartition(self.image, _name(name), attributes, group, extents))
+
+    @property
+    def size(self):
+        return self.block_devices[0]['size'] if self.block_devices else self.image.size
+
+    def partition(self, name):
+        for partition in self.partitions:
+            if partition.name == name:
+                return partition
+        raise KeyError(name)
+
+    def to_dict(self):
+        return {
+            'version': '.'.join(map(str, self.version)),
+            'size': self.size,
+            'metadata_max_size': self.geometry.metadata_max_size,
+            'metadata_slots': self.geometry.metadata_slot_count,
+            'block_devices': self.block_devices,
+            'groups': self.groups,
+            'partitions': [p.to_dict() for p in self.partitions],
+        }
+
+
+def unpack(super_path, output_dir, names=None, slot=0, log=print):
+    """Write logical partitions as raw images, like `lpunpack`.
+
+    Empty partitions (e.g. the inactive _b slot) are skipped.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    with SuperImage(super_path, slot) as super_image:
+        for partition in super_image.partitions:
+            if names and partition.name not in names:
+                continue
+            if not partition.size:
+                continue
+            path = os.path.join(output_dir, f"{partition.name}.img")
+            partition.write_to(path)
+            log(f"  Unpacked {partition.name}.img ({partition.size} bytes)")
+            written.append(path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unpack logical partitions from super.img")
+    parser.add_argument('super_image', help="super.img, raw or sparse")
+    parser.add_argument('output_dir', nargs='?')
+    parser.add_argument('-p', '--partition', action='append', help="Only unpack this partition (repeatable)")
+    parser.add_argument('-S', '--slot', type=int, default=0, help="Metadata slot to read")
+    parser.add_argument('--info', action='store_true', help="Print the LP metadata as JSON instead")
+    args = parser.parse_args()
+
+    try:
+        if args.info or not args.output_dir:
+            with SuperImage(args.super_image, args.slot) as super_image:
+                print(json.dumps(super_image.to_dict(), indent=2))
+        else:
+            unpack(args.super_image, args.output_dir, args.partition, args.slot)
+    except (OSError, LpError, SparseError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of extracted partition images
+Images are keyed by the SHA-256 the payload manifest records for them, so any
+ROM that ships the same partition reuses it; a local directory is trimmed to a
+byte budget (least recently used first) and an rclone remote can back it
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import subprocess
+from stage_files import format_size, stage_file
+
+DEFAULT_BUDGET = 20 * 1024 * 1024 * 1024
+
+
+def hash_file(path, chunk_size=4 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class PartitionCache:
+    """Local image store, optionally backed by an rclone remote.
+
+    Objects live at <root>/<xx>/<sha256>.img and are placed into and taken
+    from the cache with stage_file, so a hit on the same filesystem is a
+    hardlink rather than a copy. An object's mtime is its last use.
+    """
+
+    def __init__(self, root, budget=DEFAULT_BUDGET, remote=None, log=print):
+        self.root = root
+        self.budget = budget
+        self.remote = remote.rstrip('/') if remote else None
+        self.log = log
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest):
+        name = digest.hex()
+        return os.path.join(self.root, name[:2], f"{name}.img")
+
+    def _remote_path(self, digest):
+        return f"{self.remote}/{digest.hex()}.img"
+
+    def fetch(self, digest, dest):
+        """Place the image with this digest at dest; False on a miss."""
+        path = self.path(digest)
+        if not os.path.exists(path) and not self._pull(digest, path):
+            return False
+        os.utime(path)
+        stage_file(path, dest)
+        return True
+
+    def store(self, digest, src, verified=False):
+        """Add an image (hashed first unless the caller already verified it)."""
+        path = self.path(digest)
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+        if not verified and hash_file(src) != digest:
+            raise ValueError(f"{src} does not match its manifest hash, not caching it")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.part"
+        stage_file(src, temp)
+        os.replace(temp, path)
+        if self.remote:
+            self._push(digest, path)
+        self.evict(keep=path)
+        return path
+
+    def _rclone(self, *args):
+        """Run rclone; returns (ok, stderr), with a missing binary as a failure."""
+        try:
+            result = subprocess.run(['rclone', *args], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            return False, str(e)
+        return result.returncode == 0, result.stderr.strip()
+
+    def _pull(self, digest, path):
+        if not self.remote:
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.part"
+        ok, _ = self._rclone('copyto', self._remote_path(digest), temp)
+        if not ok or not os.path.exists(temp):
+            _remove(temp)
+            return False
+        if hash_file(temp) != digest:
+            self.log(f"Warning: remote cache object {digest.hex()} is corrupt, ignoring it")
+            _remove(temp)
+            return False
+        os.replace(temp, path)
+        self.evict(keep=path)
+        return True
+
+    def _push(self, digest, path):
+        ok, error = self._rclone('copyto', path, self._remote_path(digest))
+        if not ok:
+            self.log(f"Warning: could not upload {digest.hex()} to {self.remote}: {error}")
+
+    def objects(self):
+        """(mtime, allocated bytes, path) of every cached image."""
+        found = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith('.img'):
+                    continue
+                path = os.path.join(directory, name)
+                st = os.stat(path)
+                found.append((st.st_mtime, st.st_blocks * 512, path))
+        return found
+
+    def evict(self, keep=None):
+        """Drop least recently used images until the cache fits its budget."""
+        objects = sorted(self.objects())
+        total = sum(size for _, size, _ in objects)
+        removed = 0
+        for _, size, path in objects:
+            if total <= self.budget:
+                break
+            if path == keep:
+                continue
+            _remove(path)
+            total -= size
+            removed += size
+        if removed:
+            self.log(f"  Partition cache: evicted {format_size(removed)}, {format_size(total)} in use")
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or trim the partition image cache")
+    parser.add_argument('cache_dir')
+    parser.add_argument('--budget', type=int, default=DEFAULT_BUDGET, help="Bytes to keep (default: 20 GiB)")
+    parser.add_argument('--evict', action='store_true', help="Trim the cache to the budget now")
+    args = parser.parse_args()
+
+    try:
+        cache = PartitionCache(args.cache_dir, args.budget)
+        if args.evict:
+            cache.evict()
+        objects = cache.objects()
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps({
+        'images': len(objects),
+        'bytes': sum(size for _, size, _ in objects),
+        'budget': cache.budget,
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Extract partition images from payload.bin (full A/B OTA)
+Operations run in parallel in a process pool and are written with positional
+writes into preallocated images; payload.bin is read in place from the ROM zip,
+which may also be a URL read with range requests instead of a download
+"""
+import os
+import sys
+import bz2
+import lzma
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import zipfile
+import functools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from payload_manifest import PAYLOAD_NAME, CompressedPayloadError, PayloadError, read_payload
+from extraction_plan import TARGET_PARTITIONS, parse_patterns, plan_extraction
+from remote_zip import RemoteFile, is_url, open_source
+from partition_cache import DEFAULT_BUDGET, PartitionCache, hash_file
+from lpmake import parse_size
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+OP_REPLACE = 0
+OP_REPLACE_BZ = 1
+OP_ZERO = 6
+OP_DISCARD = 7
+OP_REPLACE_XZ = 8
+OP_REPLACE_ZSTD = 14
+SUPPORTED_OPS = {OP_REPLACE, OP_REPLACE_BZ, OP_ZERO, OP_DISCARD, OP_REPLACE_XZ, OP_REPLACE_ZSTD}
+
+# Output bytes per pool task; big enough to amortize scheduling, small
+# enough to spread a single large partition over every core
+TASK_BYTES = 64 * 1024 * 1024
+
+# Per worker process cache of pread-style payload readers
+_payload_readers = {}
+
+
+def decode(op_type, data):
+    """Turn operation data into the raw bytes to write."""
+    if op_type == OP_REPLACE:
+        return data
+    if op_type == OP_REPLACE_XZ:
+        return lzma.decompress(data)
+    if op_type == OP_REPLACE_BZ:
+        return bz2.decompress(data)
+    if op_type == OP_REPLACE_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=1 << 31)
+    raise PayloadError(f"Unsupported operation type {op_type}")
+
+
+def payload_reader(payload_path):
+    """pread(length, offset) over a local payload or a URL, cached per process."""
+    reader = _payload_readers.get(payload_path)
+    if reader is None:
+        if is_url(payload_path):
+            # Each worker fetches its own ranges, so downloads overlap decoding;
+            # operations are read by offset, so sequential readahead is wasted
+            reader = RemoteFile(payload_path, readahead=0).pread
+        else:
+            reader = functools.partial(os.pread, os.open(payload_path, os.O_RDONLY))
+        _payload_readers[payload_path] = reader
+    return reader
+
+
+def run_operations(payload_path, data_start, image_path, block_size, operations, verify):
+    """Apply a batch of operations to one image (runs in a worker process)."""
+    pread = payload_reader(payload_path)
+    out_fd = os.open(image_path, os.O_WRONLY)
+    written = 0
+    try:
+        for op_type, data_offset, data_length, extents, digest in operations:
+            if op_type in (OP_ZERO, OP_DISCARD):
+                # Images start out as holes, which already read back as zeros
+                continue
+            data = pread(data_length, data_start + data_offset)
+            if len(data) != data_length:
+                raise PayloadError(f"Short read at payload offset {data_offset}")
+            if verify and digest and hashlib.sha256(data).digest() != digest:
+                raise PayloadError(f"Operation data hash mismatch at payload offset {data_offset}")
+            data = memoryview(decode(op_type, data))
+            pos = 0
+            for start_block, num_blocks in extents:
+                length = num_blocks * block_size
+                os.pwrite(out_fd, data[pos:pos + length], start_block * block_size)
+                pos += length
+            written += pos
+    finally:
+        os.close(out_fd)
+    return written
+
+
+def plan_tasks(partition, block_size, task_bytes=TASK_BYTES):
+    """Split a partition's operations into batches of roughly task_bytes output."""
+    batch = []
+    batch_bytes = 0
+    for op in partition.operations:
+        if op.type not in SUPPORTED_OPS:
+            raise PayloadError(
+                f"{partition.name}: {op.type_name} operations need a source image "
+                f"(incremental OTA); only full OTAs are supported"
+            )
+        if op.type == OP_REPLACE_ZSTD and zstandard is None:
+            raise PayloadError(f"{partition.name}: REPLACE_ZSTD needs the 'zstandard' package")
+        batch.append((op.type, op.data_offset, op.data_length, op.dst_extents, op.data_sha256))
+        batch_bytes += sum(count for _, count in op.dst_extents) * block_size
+        if batch_bytes >= task_bytes:
+            yield batch
+            batch = []
+            batch_bytes = 0
+    if batch:
+        yield batch
+
+
+def preallocate(path, size, reserve=False):
+    """Create an image of the final size; optionally reserve its blocks."""
+    # Never truncate in place: an old image may be hardlinked from the cache
+    if os.path.lexists(path):
+        os.remove(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size)
+        if reserve and hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(fd, 0, size)
+    finally:
+        os.close(fd)
+
+
+def select_partitions(payload, names=None):
+    """Partitions to extract, in manifest order (None = all)."""
+    if names is None:
+        return list(payload.partitions)
+    wanted = set(names)
+    missing = wanted - {p.name for p in payload.partitions}
+    if missing:
+        print(f"Warning: not in payload: {', '.join(sorted(missing))}", file=sys.stderr)
+    return [p for p in payload.partitions if p.name in wanted]
+
+
+def extract_payload(payload, output_dir, partitions=None, workers=None,
+                    verify=False, reserve=False, cache=None, log=print):
+    """Extract the given partitions (default: all) into output_dir/<name>.img.
+
+    With a PartitionCache, images it already holds are taken from it and
+    newly extracted ones are added to it.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    wanted = select_partitions(payload, partitions)
+    selected = wanted
+    if cache:
+        selected = []
+        for partition in wanted:
+            image_path = os.path.join(output_dir, f"{partition.name}.img")
+            if partition.hash and cache.fetch(partition.hash, image_path):
+                log(f"  {partition.name}.img from cache ({partition.size} bytes)")
+            else:
+                selected.append(partition)
+    data_start = payload.offset + payload.data_offset
+    block_size = payload.block_size
+
+    # Validate every operation before writing anything
+    tasks = []
+    for partition in selected:
+        image_path = os.path.join(output_dir, f"{partition.name}.img")
+        for batch in plan_tasks(partition, block_size):
+            tasks.append((partition, image_path, batch))
+    for partition in selected:
+        preallocate(os.path.join(output_dir, f"{partition.name}.img"), partition.size, reserve)
+
+    remaining = {partition.name: 0 for partition in selected}
+    for partition, _, _ in tasks:
+        remaining[partition.name] += 1
+
+    start = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(run_operations, payload.path, data_start, image_path, block_size, batch, verify): partition
+            for partition, image_path, batch in tasks
+        }
+        for future in as_completed(futures):
+            partition = futures[future]
+            future.result()
+            remaining[partition.name] -= 1
+            if remaining[partition.name] == 0:
+                log(f"  Extracted {partition.name}.img ({partition.size} bytes)")
+
+    if verify:
+        for partition in selected:
+            image_path = os.path.join(output_dir, f"{partition.name}.img")
+            if partition.hash and hash_file(image_path) != partition.hash:
+                raise PayloadError(f"{partition.name}: image hash mismatch")
+        log("  All partition hashes verified")
+
+    log(f"Extracted {len(selected)} partitions in {time.monotonic() - start:.1f}s")
+    if cache:
+        for partition in selected:
+            if partition.hash:
+                cache.store(partition.hash, os.path.join(output_dir, f"{partition.name}.img"), verified=verify)
+        log(f"  {len(wanted) - len(selected)} of {len(wanted)} partitions came from the cache")
+    return [os.path.join(output_dir, f"{p.name}.img") for p in wanted]
+
+
+def open_payload(rom_path, scratch_dir, log=print):
+    """Parse the payload in place; a deflated payload.bin is unpacked once first."""
+    try:
+        return read_payload(rom_path), None
+    except CompressedPayloadError:
+        pass
+    log(f"{PAYLOAD_NAME} is compressed in the zip, unpacking it first...")
+    os.makedirs(scratch_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix='payload_', suffix='.bin', dir=scratch_dir)
+    with open_source(rom_path) as f, zipfile.ZipFile(f) as zf, zf.open(PAYLOAD_NAME) as src, \
+            os.fdopen(fd, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 4 * 1024 * 1024)
+    return read_payload(temp_path), temp_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract partition images from payload.bin")
+    parser.add_argument('payload', help="ROM zip containing payload.bin (path or http(s) URL), or payload.bin itself")
+    parser.add_argument('output_dir')
+    parser.add_argument('--partitions', help="Comma separated partition names (default: all)")
+    parser.add_argument('--target', choices=sorted(TARGET_PARTITIONS),
+                        help="Only extract the partitions this conversion target uses")
+    parser.add_argument('--allow', help="With --target: extra partitions to extract (globs allowed)")
+    parser.add_argument('--deny', help="With --target: partitions to skip (globs allowed)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--verify', action='store_true', help="Check operation and partition hashes")
+    parser.add_argument('--reserve', action='store_true', help="Reserve disk blocks up front (fallocate)")
+    parser.add_argument('--cache', help="Partition cache directory (images keyed by their manifest hash)")
+    parser.add_argument('--cache-budget', help="Cache size limit, e.g. 20G (default: 20 GiB)")
+    parser.add_argument('--cache-remote', help="rclone remote path backing the cache")
+    args = parser.parse_args()
+
+    partitions = [p for p in args.partitions.split(',') if p] if args.partitions else None
+    temp_path = None
+    try:
+        payload, temp_path = open_payload(args.payload, args.output_dir)
+        if args.target and partitions is None:
+            plan = plan_extraction(payload, args.target, parse_patterns(args.allow), parse_patterns(args.deny))
+            partitions = plan['extract']
+            if plan['skip']:
+                print(f"Skipping {len(plan['skip'])} partitions for {args.target} "
+                      f"({plan['skip_bytes']} bytes): {', '.join(plan['skip'])}")
+        cache = None
+        if args.cache:
+            cache = PartitionCache(args.cache, parse_size(args.cache_budget) or DEFAULT_BUDGET, args.cache_remote)
+        extract_payload(payload, args.output_dir, partitions, args.workers, args.verify, args.reserve, cache)
+    except (OSError, ValueError, PayloadError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Parse payload.bin (A/B OTA) headers and manifests without extracting them
+Reads the CrAU header and the DeltaArchiveManifest protobuf directly, from a
+bare payload.bin or from a payload.bin stored inside the ROM zip, local or
+read over HTTP range requests
+"""
+import sys
+import json
+import struct
+import zipfile
+from remote_zip import open_source
+
+PAYLOAD_MAGIC = b'CrAU'
+PAYLOAD_NAME = 'payload.bin'
+HEADER_SIZE = 24  # magic + version + manifest size + metadata signature size
+ZIP_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+ZIP_LOCAL_HEADER_MAGIC = 0x04034b50
+
+# InstallOperation.Type values from update_metadata.proto
+OPERATION_TYPES = {
+    0: 'REPLACE',
+    1: 'REPLACE_BZ',
+    2: 'MOVE',
+    3: 'BSDIFF',
+    4: 'SOURCE_COPY',
+    5: 'SOURCE_BSDIFF',
+    6: 'ZERO',
+    7: 'DISCARD',
+    8: 'REPLACE_XZ',
+    9: 'PUFFDIFF',
+    10: 'BROTLI_BSDIFF',
+    11: 'ZUCCHINI',
+    12: 'LZ4DIFF_BSDIFF',
+    13: 'LZ4DIFF_PUFFDIFF',
+    14: 'REPLACE_ZSTD',
+}
+
+
+class PayloadError(Exception):
+    """Raised for missing, compressed or malformed payloads."""
+
+
+class CompressedPayloadError(PayloadError):
+    """payload.bin is deflated inside its zip, so it cannot be read in place."""
+
+
+def read_varint(buf, pos):
+    """Decode a protobuf varint, return (value, new_pos)."""
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise PayloadError("Truncated varint in manifest")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def iter_fields(buf):
+    """Yield (field_number, wire_type, value) for a protobuf message.
+
+    Length-delimited values are returned as memoryview slices, so nested
+    messages are only decoded when asked for.
+    """
+    buf = memoryview(buf)
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = read_varint(buf, pos)
+        elif wire_type == 1:
+            if pos + 8 > end:
+                raise PayloadError("Truncated field in manifest")
+            value = struct.unpack_from('<Q', buf, pos)[0]
+            pos += 8
+        elif wire_type == 2:
+            length, pos = read_varint(buf, pos)
+            if pos + length > end:
+                raise PayloadError("Truncated field in manifest")
+            value = buf[pos:pos + length]
+            pos += length
+        elif wire_type == 5:
+            if pos + 4 > end:
+                raise PayloadError("Truncated field in manifest")
+            value = struct.unpack_from('<I', buf, pos)[0]
+            pos += 4
+        else:
+            raise PayloadError(f"Unsupported protobuf wire type {wire_type}")
+        yield field, wire_type, value
+
+
+def parse_extents(raw_extents):
+    """Decode Extent messages into (start_block, num_blocks) tuples."""
+    extents = []
+    for raw in raw_extents:
+        start = count = 0
+        for field, _, value in iter_fields(raw):
+            if field == 1:
+                start = value
+            elif field == 2:
+                count = value
+        extents.append((start, count))
+    return extents
+
+
+class Operation:
+    """One InstallOperation: where its data lives and which blocks it writes."""
+
+    __slots__ = ('type', 'data_offset', 'data_length', 'dst_extents', 'src_extents', 'data_sha256')
+
+    def __init__(self, raw):
+        self.type = 0
+        self.data_offset = 0
+        self.data_length = 0
+        self.data_sha256 = None
+        dst = []
+        src = []
+        for field, _, value in iter_fields(raw):
+            if field == 1:
+                self.type = value
+            elif field == 2:
+                self.data_offset = value
+            elif field == 3:
+                self.data_length = value
+            elif field == 4:
+                src.append(value)
+            elif field == 6:
+                dst.append(value)
+            elif field == 8:
+                self.data_sha256 = bytes(value)
+        self.dst_extents = parse_extents(dst)
+        self.src_extents = parse_extents(src)
+
+    @property
+    def type_name(self):
+        return OPERATION_TYPES.get(self.type, f'UNKNOWN_{self.type}')
+
+
+class Partition:
+    """PartitionUpdate summary; operations are decoded lazily."""
+
+    def __init__(self, raw):
+        self.name = None
+        self.size = 0
+        self.hash = None
+        self.old_size = None
+        self.version = None
+        self._raw_operations = []
+        self._operations = None
+        for field, _, value in iter_fields(raw):
+            if field == 1:
+                self.name = bytes(value).decode()
+            elif field == 6:
+                self.old_size = self._partition_info(value)[0]
+            elif field == 7:
+                self.size, self.hash = self._partition_info(value)
+            elif field == 8:
+                self._raw_operations.append(value)
+            elif field == 17:
+                self.version = bytes(value).decode()
+
+    @staticmethod
+    def _partition_info(raw):
+        size = 0
+        digest = None
+        for field, _, value in iter_fields(raw):
+            if field == 1:
+                size = value
+            elif field == 2:
+                digest = bytes(value)
+        return size, digest
+
+    @property
+    def operation_count(self):
+        return len(self._raw_operations)
+
+    @property
+    def operations(self):
+        if self._operations is None:
+            self._operations = [Operation(raw) for raw in self._raw_operations]
+        return self._operations
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'size': self.size,
+            'sha256': self.hash.hex() if self.hash else None,
+            'operations': self.operation_count,
+        }
+
+
+class Payload:
+    """Parsed payload header and manifest.
+
+    ``offset`` is where payload.bin starts inside ``path`` (non-zero when it
+    is stored in a zip); ``data_offset`` is relative to the payload start.
+    """
+
+    def __init__(self, path, offset, size, version, manifest, metadata_signature_size):
+        self.path = path
+        self.offset = offset
+        self.size = size
+        self.version = version
+        self.manifest_size = len(manifest)
+        self.metadata_signature_size = metadata_signature_size
+        self.data_offset = HEADER_SIZE + self.manifest_size + metadata_signature_size
+        self.block_size = 4096
+        self.minor_version = 0
+        self.security_patch_level = None
+        self.partial_update = False
+        self.partitions = []
+        self.dynamic_groups = []
+
+        for field, _, value in iter_fields(manifest):
+            if field == 3:
+                self.block_size = value
+            elif field == 12:
+                self.minor_version = value
+            elif field == 13:
+                self.partitions.append(Partition(value))
+            elif field == 15:
+                self.dynamic_groups = self._dynamic_groups(value)
+            elif field == 16:
+                self.partial_update = bool(value)
+            elif field == 18:
+                self.security_patch_level = bytes(value).decode()
+
+    @staticmethod
+    def _dynamic_groups(raw):
+        groups = []
+        for field, _, value in iter_fields(raw):
+            if field != 1:
+                continue
+            group = {'name': None, 'size': 0, 'partitions': []}
+            for group_field, _, group_value in iter_fields(value):
+                if group_field == 1:
+                    group['name'] = bytes(group_value).decode()
+                elif group_field == 2:
+                    group['size'] = group_value
+                elif group_field == 3:
+                    group['partitions'].append(bytes(group_value).decode())
+            groups.append(group)
+        return groups
+
+    @property
+    def is_full(self):
+        """True if every partition can be built without a source image."""
+        return all(partition.old_size is None for partition in self.partitions)
+
+    def partition(self, name):
+        for partition in self.partitions:
+            if partition.name == name:
+                return partition
+        raise KeyError(name)
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'minor_version': self.minor_version,
+            'block_size': self.block_size,
+            'full_update': self.is_full,
+            'security_patch_level': self.security_patch_level,
+            'payload_size': self.size,
+            'total_partition_size': sum(p.size for p in self.partitions),
+            'partitions': [p.to_dict() for p in self.partitions],
+            'dynamic_groups': self.dynamic_groups,
+        }
+
+
+def locate_payload(path):
+    """Return (path, offset, size) of payload.bin, bare or stored in a zip."""
+    with open_source(path) as f:
+        if not zipfile.is_zipfile(f):
+            f.seek(0, 2)
+            return path, 0, f.tell()
+
+        with zipfile.ZipFile(f) as zf:
+            try:
+                info = zf.getinfo(PAYLOAD_NAME)
+            except KeyError:
+                raise PayloadError(f"No {PAYLOAD_NAME} in {path}")
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise CompressedPayloadError(f"{PAYLOAD_NAME} is compressed inside the zip, "
+                                             "random access needs it stored")
+
+        # Data starts after the local file header, whose name/extra lengths
+        # may differ from the central directory copy
+        f.seek(info.header_offset)
+        header = ZIP_LOCAL_HEADER.unpack(f.read(ZIP_LOCAL_HEADER.size))
+    if header[0] != ZIP_LOCAL_HEADER_MAGIC:
+        raise PayloadError(f"Corrupt local header for {PAYLOAD_NAME}")
+    name_length, extra_length = header[9], header[10]
+    offset = info.header_offset + ZIP_LOCAL_HEADER.size + name_length + extra_length
+    return path, offset, info.file_size
+
+
+def _parse_payload(f, path, offset, size):
+    """Read the header and manifest from f, positioned at the payload start."""
+    header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:4] != PAYLOAD_MAGIC:
+        raise PayloadError("Not a payload.bin (bad CrAU magic)")
+    version, manifest_size = struct.unpack('>QQ', header[4:20])
+    if version != 2:
+        raise PayloadError(f"Unsupported payload version {version}")
+    metadata_signature_size = struct.unpack('>I', header[20:24])[0]
+    manifest = f.read(manifest_size)
+    if len(manifest) != manifest_size:
+        raise PayloadError("Truncated payload manifest")
+
+    payload = Payload(path, offset, size, version, manifest, metadata_signature_size)
+    if not payload.partitions:
+        raise PayloadError("Payload manifest lists no partitions")
+    return payload
+
+
+def read_payload(path):
+    """Parse the payload header and manifest from payload.bin or a ROM zip."""
+    path, offset, size = locate_payload(path)
+    with open_source(path) as f:
+        f.seek(offset)
+        return _parse_payload(f, path, offset, size)
+
+
+def read_manifest(path):
+    """Like read_payload, but also for a payload.bin deflated inside the zip.
+
+    The header and manifest sit at the start of the member, so they are
+    inflated sequentially; such a payload has no offset and can describe
+    partitions but not be extracted in place.
+    """
+    with open_source(path) as f:
+        if zipfile.is_zipfile(f):
+            with zipfile.ZipFile(f) as zf:
+                info = zf.NameToInfo.get(PAYLOAD_NAME)
+                if info is not None and info.compress_type != zipfile.ZIP_STORED:
+                    with zf.open(info) as member:
+                        return _parse_payload(member, path, None, info.file_size)
+    return read_payload(path)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: payload_manifest.py <rom.zip|payload.bin>")
+        sys.exit(1)
+
+    try:
+        payload = read_manifest(sys.argv[1])
+    except (OSError, PayloadError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(payload.to_dict(), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Read ROM zips over HTTP range requests instead of downloading them first
+A remote file is fetched in blocks on a small pool of keep-alive connections,
+with readahead for sequential reads, so zipfile, payload.bin parsing and
+extraction work on a URL as if it were a local file
+"""
+import io
+import os
+import re
+import sys
+import zipfile
+import argparse
+import threading
+import http.client
+import http.server
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+BLOCK_SIZE = 1024 * 1024
+READAHEAD_BLOCKS = 8
+CACHE_BLOCKS = 32
+CONNECTIONS = 4
+RETRIES = 3
+TIMEOUT = 60
+
+
+class RemoteZipError(OSError):
+    """Raised when a URL cannot be read with range requests (an I/O error to callers)."""
+
+
+def is_url(path):
+    return isinstance(path, str) and path.startswith(('http://', 'https://'))
+
+
+def open_source(path):
+    """Binary, seekable file object for a local path or an http(s) URL."""
+    if is_url(path):
+        return io.BufferedReader(RemoteFile(path), BLOCK_SIZE)
+    return open(path, 'rb')
+
+
+def probe(url):
+    """Follow redirects and return (final URL, size); the server must honour Range."""
+    request = urllib.request.Request(url, headers={'Range': 'bytes=0-0'})
+    try:
+        with urllib.request.urlopen(request, timeout=TIMEOUT) as response:
+            content_range = response.headers.get('Content-Range', '')
+            final_url = response.geturl()
+            status = response.status
+    except OSError as e:
+        raise RemoteZipError(f"{url}: {e}")
+    match = re.fullmatch(r'bytes 0-0/(\d+)', content_range.strip())
+    if status != 206 or not match:
+        raise RemoteZipError(f"{url}: server does not support range requests")
+    return final_url, int(match.group(1))
+
+
+class RemoteFile(io.RawIOBase):
+    """Seekable read-only view of a URL, fetched in blocks with range requests.
+
+    Blocks a read needs are fetched in parallel, the next few are requested
+    ahead of time, and recently used ones are kept in a small LRU cache.
+    ``pread`` mirrors os.pread for code that reads by offset.
+    """
+
+    def __init__(self, url, block_size=BLOCK_SIZE, readahead=READAHEAD_BLOCKS,
+                 cache_blocks=CACHE_BLOCKS, connections=CONNECTIONS):
+        super().__init__()
+        self.url, self.size = probe(url)
+        parts = urllib.parse.urlsplit(self.url)
+        self._connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                  else http.client.HTTPConnection)
+        self._netloc = parts.netloc
+        self._target = parts.path + (f"?{parts.query}" if parts.query else '')
+        self.block_size = block_size
+        self.readahead = readahead
+        self.cache_blocks = max(cache_blocks, readahead * 2)
+        self.block_count = (self.size + block_size - 1) // block_size
+        self.pos = 0
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(connections)
+
+    def _connection(self, fresh=False):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or fresh:
+            if connection is not None:
+                connection.close()
+            connection = self._local.connection = self._connection_class(self._netloc, timeout=TIMEOUT)
+        return connection
+
+    def _fetch(self, index):
+        """GET one block on this thread's connection, reconnecting on errors."""
+        start = index * self.block_size
+        end = min(start + self.block_size, self.size) - 1
+        error = None
+        for attempt in range(RETRIES):
+            try:
+                connection = self._connection(fresh=attempt > 0)
+                connection.request('GET', self._target, headers={'Range': f'bytes={start}-{end}'})
+                response = connection.getresponse()
+                data = response.read()
+                if response.status != 206:
+                    raise RemoteZipError(f"HTTP {response.status} for bytes {start}-{end}")
+                if len(data) != end - start + 1:
+                    raise RemoteZipError(f"Short read for bytes {start}-{end}")
+                return data
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+        raise RemoteZipError(f"{self.url}: {error}")
+
+    def _request(self, index):
+        if index not in self._cache and index not in self._inflight:
+            self._inflight[index] = self._pool.submit(self._fetch, index)
+
+    def _store(self, index, data):
+        self._cache[index] = data
+        while len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+
+    def _block(self, index):
+        data = self._cache.get(index)
+        if data is not None:
+            self._cache.move_to_end(index)
+            return data
+        self._request(index)
+        data = self._inflight.pop(index).result()
+        self._store(index, data)
+        return data
+
+    def _trim(self, window):
+        """Drop readahead outside the current window after a jump.
+
+        Queued requests are cancelled; finished ones move to the LRU cache,
+        so readahead nobody reads is eventually evicted.
+        """
+        for index, future in list(self._inflight.items()):
+            if index in window:
+                continue
+            if future.cancel():
+                del self._inflight[index]
+            elif future.done():
+                del self._inflight[index]
+                if future.exception() is None:
+                    self._store(index, future.result())
+
+    def pread(self, length, offset):
+        end = min(offset + length, self.size)
+        if offset >= end:
+            return b''
+        first = offset // self.block_size
+        last = (end - 1) // self.block_size
+        window = range(first, min(last + 1 + self.readahead, self.block_count))
+        self._trim(window)
+        for index in window:
+            self._request(index)
+        data = b''.join(self._block(index) for index in range(first, last + 1))
+        skip = offset - first * self.block_size
+        return data[skip:skip + end - offset]
+
+    def readinto(self, buffer):
+        data = self.pread(len(buffer), self.pos)
+        buffer[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise OSError("Negative seek position")
+        self.pos = offset
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def close(self):
+        # Also reached from __del__ when probe() failed in __init__
+        if not self.closed and hasattr(self, '_pool'):
+            for future in self._inflight.values():
+                future.cancel()
+            self._pool.shutdown(wait=False)
+        super().close()
+
+
+def list_members(source):
+    with open_source(source) as f, zipfile.ZipFile(f) as zf:
+        return zf.infolist()
+
+
+def extract_members(source, output_dir, names=None, workers=CONNECTIONS, log=print):
+    """Extract zip members (default: all) like `unzip`, several at a time.
+
+    Each member streams through its own reader, so downloading, inflating
+    and writing overlap and the zip itself is never stored.
+    """
+    members = [info for info in list_members(source) if not info.is_dir()]
+    if names:
+        members = [info for info in members if info.filename in names]
+    os.makedirs(output_dir, exist_ok=True)
+
+    def extract(info):
+        with open_source(source) as f, zipfile.ZipFile(f) as zf:
+            path = zf.extract(info, output_dir)
+        log(f"  {info.filename} ({info.file_size} bytes)")
+        return path
+
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(extract, members))
+
+
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Static file handler that honours single byte ranges, for local testing."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this every
+    # keep-alive request waits on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def end_headers(self):
+        self.send_header('Accept-Ranges', 'bytes')
+        super().end_headers()
+
+    def send_head(self):
+        self.range = None
+        header = self.headers.get('Range', '')
+        match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+        f = open(path, 'rb')
+        size = os.fstat(f.fileno()).st_size
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start = max(0, size - int(last or 0))
+            end = size - 1
+        if start > end:
+            f.close()
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        f.seek(start)
+        self.range = (start, end)
+        return f
+
+    def copyfile(self, source, outputfile):
+        if self.range is None:
+            return super().copyfile(source, outputfile)
+        remaining = self.range[1] - self.range[0] + 1
+        while remaining:
+            chunk = source.read(min(remaining, 64 * 1024))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory, port=8000, bind='127.0.0.1'):
+    handler = lambda *args, **kwargs: RangeRequestHandler(*args, directory=directory, **kwargs)
+    server = http.server.ThreadingHTTPServer((bind, port), handler)
+    print(f"Serving {directory} with range support on http://{bind}:{server.server_port}/")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read ROM zips over HTTP range requests")
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('list', help="List the members of a zip (path or URL)")
+    command.add_argument('source')
+    command = commands.add_parser('extract', help="Extract members without storing the zip")
+    command.add_argument('source')
+    command.add_argument('output_dir')
+    command.add_argument('members', nargs='*', help="Members to extract (default: all)")
+    command.add_argument('--workers', type=int, default=CONNECTIONS, help="Members extracted at once")
+    command = commands.add_parser('probe', help="Check that a URL supports range requests")
+    command.add_argument('url')
+    command = commands.add_parser('serve', help="Serve a directory with range support (testing)")
+    command.add_argument('directory', nargs='?', default='.')
+    command.add_argument('--port', type=int, default=8000)
+    command.add_argument('--bind', default='127.0.0.1')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'list':
+            for info in list_members(args.source):
+                print(info.filename)
+        elif args.command == 'extract':
+            extract_members(args.source, args.output_dir, args.members, args.workers)
+        elif args.command == 'probe':
+            url, size = probe(args.url)
+            print(f"{size} bytes at {url}")
+        else:
+            serve(args.directory, args.port, args.bind)
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Convert a base ROM into a super, hybrid or recovery package
+Every output format is a backend that adds its steps to one task graph on
+top of the shared extraction steps; steps whose inputs are ready run
+concurrently, and each one is reported as a JSON progress event with its timing
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import zipfile
+import argparse
+import tempfile
+import threading
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from extraction_plan import HYBRID_PARTITIONS, parse_patterns, plan_extraction, super_partitions
+from payload_manifest import PAYLOAD_NAME, PayloadError
+from payload_extract import extract_payload, open_payload
+from partition_cache import DEFAULT_BUDGET, PartitionCache
+from remote_zip import extract_members, list_members
+from lpmake import build_super, parse_size
+from lpunpack import LpError, SuperImage
+from sparse_image import SparseError
+from stage_files import format_size
+from zip_stream import AUTO, DEFAULT_CHECKSUMS, ZipStreamError, ZipStreamWriter, add_super_partitions, describe, \
+    write_checksums
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+PLATFORM_TOOLS_URL = 'https://dl.google.com/android/repository/platform-tools-latest-windows.zip'
+DEFAULT_JOBS = 4
+
+
+class ConversionError(Exception):
+    """Raised when the ROM does not have what the output format needs."""
+
+
+class Progress:
+    """Plain log lines for people, JSON lines for the workflow.
+
+    Every event carries the seconds since the conversion started; log lines
+    are tagged with the task that wrote them.
+    """
+
+    def __init__(self, events=None):
+        self.events = events
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def emit(self, event, **fields):
+        if self.events is None:
+            return
+        record = {'event': event, 'elapsed': round(time.monotonic() - self.started, 3), **fields}
+        with self.lock:
+            self.events.write(json.dumps(record) + '\n')
+            self.events.flush()
+
+    def log(self, message, task=None):
+        task = task or getattr(self.local, 'task', None)
+        with self.lock:
+            print(f"[{task}] {message}" if task else message, flush=True)
+        self.emit('log', task=task, message=message)
+
+    def logger(self):
+        """log() for helper threads, tagged with the calling thread's task."""
+        task = getattr(self.local, 'task', None)
+        return lambda message: self.log(message, task)
+
+
+class Task:
+    __slots__ = ('name', 'func', 'deps', 'seconds')
+
+    def __init__(self, name, func, deps):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.seconds = None
+
+
+class TaskGraph:
+    """Named steps and the steps they wait for.
+
+    Steps start as soon as everything they depend on has finished, up to
+    ``jobs`` at a time; after a failure nothing new is started and the first
+    error is raised once the running steps are done.
+    """
+
+    def __init__(self, progress, jobs=DEFAULT_JOBS):
+        self.progress = progress
+        self.jobs = jobs
+        self.tasks = {}
+
+    def add(self, name, func, deps=()):
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"Task {name} depends on unknown task {dep}")
+        self.tasks[name] = Task(name, func, deps)
+        return name
+
+    def _run(self, task):
+        self.progress.local.task = task.name
+        start = time.monotonic()
+        try:
+            task.func()
+        finally:
+            task.seconds = time.monotonic() - start
+            self.progress.local.task = None
+
+    def run(self):
+        """Run every step; returns {name: seconds} in the order they were added."""
+        done = set()
+        running = {}
+        error = None
+        with ThreadPoolExecutor(self.jobs) as pool:
+            while True:
+                if error is None:
+                    started = set(running.values())
+                    for task in self.tasks.values():
+                        if task.name in done or task.name in started or len(running) >= self.jobs:
+                            continue
+                        if all(dep in done for dep in task.deps):
+                            self.progress.emit('start', task=task.name)
+                            running[pool.submit(self._run, task)] = task.name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = self.tasks[running.pop(future)]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.progress.emit('failed', task=task.name, seconds=round(task.seconds, 3), error=str(e))
+                        error = error or e
+                    else:
+                        done.add(task.name)
+                        self.progress.emit('finish', task=task.name, seconds=round(task.seconds, 3))
+        if error is not None:
+            raise error
+        return {name: task.seconds for name, task in self.tasks.items()}
+
+
+class Conversion:
+    """One ROM on its way to one output format: paths, options, shared steps."""
+
+    def __init__(self, rom, output_dir, work_dir, options, progress):
+        self.rom = rom
+        self.output_dir = output_dir
+        self.work_dir = work_dir
+        self.options = options
+        self.progress = progress
+        self.log = progress.log
+        self.extract_dir = os.path.join(work_dir, 'extracted')
+        self.graph = TaskGraph(progress, options.jobs)
+        self.payload = None
+        self.temp_payload = None
+        self.partitions = None
+        os.makedirs(self.extract_dir, exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def image(self, name):
+        return os.path.join(self.extract_dir, f"{name}.img")
+
+    def images(self):
+        return sorted(os.path.join(self.extract_dir, name) for name in os.listdir(self.extract_dir)
+                      if name.endswith('.img'))
+
+    def super_image(self):
+        for name in ('super.img', 'super.img.sparse'):
+            path = os.path.join(self.extract_dir, name)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def add_extraction(self, target, first=None):
+        """Shared steps that put the ROM's images into extract_dir.
+
+        Payload partitions named by ``first()`` (called once the ROM has been
+        inspected) are extracted in a step of their own so the backend can
+        start on them while the rest are still being written. Returns (that
+        step, the step after which every image is there).
+        """
+        graph = self.graph
+        graph.add('inspect', lambda: self._inspect(target))
+        if first is None:
+            last = graph.add('extract', lambda: self._extract(lambda name: True), ['inspect'])
+        else:
+            graph.add('extract', lambda: self._extract(lambda name: name in first()), ['inspect'])
+            last = graph.add('extract-rest', lambda: self._extract(lambda name: name not in first()), ['extract'])
+        graph.add('cleanup-rom', self._cleanup_rom, [last])
+        return 'extract', last
+
+    def _inspect(self, target):
+        names = [info.filename for info in list_members(self.rom)]
+        if PAYLOAD_NAME not in names:
+            self.log(f"No {PAYLOAD_NAME}, extracting all {len(names)} members")
+            return
+        self.log(f"Detected {PAYLOAD_NAME} (OTA format)")
+        self.payload, self.temp_payload = open_payload(self.rom, self.work_dir, log=self.log)
+        plan = plan_extraction(self.payload, target, self.options.allow, self.options.deny)
+        self.partitions = plan['extract']
+        if plan['skip']:
+            self.log(f"Skipping {len(plan['skip'])} partitions for {target} "
+                     f"({plan['skip_bytes']} bytes): {', '.join(plan['skip'])}")
+
+    def _extract(self, wanted):
+        if self.payload is None:
+            # Without a payload every member is unpacked at once, in the first step
+            if self.partitions is None:
+                self.partitions = ()
+                extract_members(self.rom, self.extract_dir, log=self.progress.logger())
+            return
+        names = [name for name in self.partitions if wanted(name)]
+        if not names:
+            return
+        cache = None
+        if self.options.cache:
+            cache = PartitionCache(self.options.cache, parse_size(self.options.cache_budget) or DEFAULT_BUDGET,
+                                   self.options.cache_remote, log=self.log)
+        extract_payload(self.payload, self.extract_dir, names, cache=cache, log=self.log)
+
+    def _cleanup_rom(self):
+        if self.temp_payload:
+            os.remove(self.temp_payload)
+            self.temp_payload = None
+        # Cleanup point chosen by disk_budget.py: the ROM is not read again
+        if self.options.delete_rom and os.path.isfile(self.rom):
+            self.log(f"Deleting {self.rom} to free disk space")
+            os.remove(self.rom)
+
+    def write_zip(self, name, directories, files, super_image=None, compress=False):
+        """Write the output zip in one pass, plus its checksum sidecars."""
+        path = os.path.join(self.output_dir, name)
+        checksums = self.options.checksums
+        with ZipStreamWriter(path, workers=self.options.zip_workers, checksums=checksums) as writer:
+            for item in [*directories, *files]:
+                for entry in writer.add_path(item, compress=compress):
+                    self.log(f"  {entry.name} ({describe(entry)})")
+            if super_image:
+                add_super_partitions(writer, super_image, compress, self.log)
+        if checksums:
+            write_checksums(path, writer.digests())
+        self.log(f"Wrote {path} ({len(writer.entries)} entries, {format_size(writer.offset)})")
+        return path
+
+    def run(self):
+        try:
+            return self.graph.run()
+        finally:
+            if self.temp_payload:
+                os.remove(self.temp_payload)
+
+
+class SuperBackend:
+    """Fastboot package: super.img built from the logical partitions, the
+    other images as they are, platform-tools and flash-all.bat."""
+
+    name = 'super'
+    output = 'super_rom.zip'
+
+    def plan(self, conversion):
+        self.conversion = conversion
+        self.package_dir = os.path.join(conversion.work_dir, 'package')
+        self.sources = []
+        os.makedirs(self.package_dir, exist_ok=True)
+        graph = conversion.graph
+        # super.img only needs the dynamic partitions, so it is built while
+        # the physical ones are still being extracted
+        logical, extracted = conversion.add_extraction(
+            self.name, first=lambda: super_partitions(conversion.payload))
+        graph.add('platform-tools', self.platform_tools)
+        graph.add('build-super', self.build_super, [logical])
+        package_deps = ['build-super', 'platform-tools', extracted]
+        if conversion.options.prune_super:
+            package_deps.append(graph.add('prune-super-sources', self.prune, ['build-super', extracted]))
+        graph.add('package', self.package, package_deps)
+
+    def platform_tools(self):
+        url = self.conversion.options.platform_tools
+        download = os.path.join(self.conversion.work_dir, 'platform-tools.zip')
+        self.conversion.log(f"Downloading {url}")
+        urllib.request.urlretrieve(url, download)
+        with zipfile.ZipFile(download) as zf:
+            zf.extractall(self.package_dir)
+        os.remove(download)
+
+    def build_super(self):
+        conversion = self.conversion
+        log = conversion.log
+        super_image = conversion.super_image()
+        # Group membership and maximum sizes come from the payload manifest
+        groups = conversion.payload.dynamic_groups if conversion.payload else []
+        group_of = {name: group['name'] for group in groups for name in group['partitions']}
+        source = None
+        if super_image:
+            # Its logical partitions are copied straight out of it, never unpacked
+            log(f"Found {os.path.basename(super_image)}, reading its partitions in place")
+            source = SuperImage(super_image)
+            images = [(partition.name, partition, group_of.get(partition.name))
+                      for partition in source.partitions if partition.size]
+        else:
+            log("No super.img found, using the individual dynamic partitions")
+            images = [(name, conversion.image(name), group_of.get(name))
+                      for name in super_partitions(conversion.payload) if os.path.isfile(conversion.image(name))]
+        # Loose copies of what ends up in super.img, for prune()
+        self.sources = [conversion.image(name) for name, _, _ in images]
+        try:
+            if not images:
+                raise ConversionError("No logical partitions found to build super.img from")
+            # payload.bin ROMs are A/B: partitions become <name>_a with empty _b slots
+            build_super(sorted(images, key=lambda image: image[0]), os.path.join(self.package_dir, 'super.img'),
+                        sparse=True, log=log, device_size=parse_size(conversion.options.super_size),
+                        ab=conversion.payload is not None,
+                        group_sizes={group['name']: group['size'] for group in groups})
+        finally:
+            if source:
+                source.close()
+
+    def prune(self):
+        # Cleanup point chosen by disk_budget.py: once super.img exists the
+        # logical images are only a fallback for flashing without it
+        conversion = self.conversion
+        conversion.log("Removing logical partition images now inside super.img...")
+        for path in self.sources:
+            if os.path.exists(path):
+                os.remove(path)
+        super_image = conversion.super_image()
+        if super_image:
+            os.remove(super_image)
+
+    def package(self):
+        conversion = self.conversion
+        images = [path for path in conversion.images() if os.path.basename(path) != 'super.img']
+        conversion.write_zip(self.output, [os.path.join(TEMPLATE_DIR, self.name), self.package_dir], images,
+                             compress=AUTO)
+
+
+class HybridBackend:
+    """TWRP package flashing both A/B slots; super.img is streamed into it
+    as its logical partitions."""
+
+    name = 'hybrid'
+    output = 'hybrid_rom.zip'
+    compress = AUTO
+
+    def plan(self, conversion):
+        self.conversion = conversion
+        _, extracted = conversion.add_extraction(self.name)
+        conversion.graph.add('package', self.package, [extracted])
+
+    def files(self):
+        return [self.conversion.image(name) for name in HYBRID_PARTITIONS
+                if os.path.isfile(self.conversion.image(name))]
+
+    def package(self):
+        conversion = self.conversion
+        super_image = os.path.join(conversion.extract_dir, 'super.img')
+        conversion.write_zip(self.output, [os.path.join(TEMPLATE_DIR, self.name)], self.files(),
+                             super_image if os.path.isfile(super_image) else None, self.compress)
+
+
+class RecoveryBackend(HybridBackend):
+    """TWRP package for the current slot with every image, stored."""
+
+    name = 'recovery'
+    output = 'recovery_rom.zip'
+    compress = False
+
+    def files(self):
+        return self.conversion.images()
+
+
+BACKENDS = {backend.name: backend for backend in (SuperBackend, HybridBackend, RecoveryBackend)}
+
+
+def convert(target, rom, output_dir, options, progress, work_dir=None):
+    """Run one conversion; returns (output zip, {step: seconds})."""
+    backend = BACKENDS[target]()
+    scratch = work_dir or tempfile.mkdtemp(prefix='romconv_')
+    try:
+        conversion = Conversion(rom, output_dir, scratch, options, progress)
+        backend.plan(conversion)
+        timings = conversion.run()
+    finally:
+        if not work_dir:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return os.path.join(output_dir, backend.output), timings
+
+
+def _env_flag(name):
+    return os.environ.get(name) == '1'
+
+
+def main():
+    env = os.environ.get
+    parser = argparse.ArgumentParser(description="Convert a base ROM into a super, hybrid or recovery package",
+                                     epilog="Defaults come from the environment variables the converter "
+                                            "scripts use (PARTITION_ALLOW, PARTITION_CACHE, ...)")
+    parser.add_argument('target', choices=sorted(BACKENDS))
+    parser.add_argument('rom', help="ROM zip (path or http(s) URL)")
+    parser.add_argument('output_dir')
+    parser.add_argument('--progress', help="Write JSON progress events to this file ('-' for stderr)")
+    parser.add_argument('--work-dir', help="Scratch directory, kept afterwards (default: a temporary one)")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help="Steps run at once")
+    parser.add_argument('--zip-workers', type=int, help="Deflate threads (default: CPU count)")
+    parser.add_argument('--allow', default=env('PARTITION_ALLOW'),
+                        help="Extra partitions to extract (comma separated, globs allowed)")
+    parser.add_argument('--deny', default=env('PARTITION_DENY'),
+                        help="Partitions never to extract (comma separated, globs allowed)")
+    parser.add_argument('--cache', default=env('PARTITION_CACHE'), help="Partition cache directory")
+    parser.add_argument('--cache-budget', default=env('PARTITION_CACHE_BUDGET'),
+                        help="Cache size limit, e.g. 20G (default: 20 GiB)")
+    parser.add_argument('--cache-remote', default=env('PARTITION_CACHE_REMOTE'),
+                        help="rclone remote path backing the cache")
+    parser.add_argument('--checksums', default=env('ZIP_CHECKSUMS') or ','.join(DEFAULT_CHECKSUMS),
+                        help="Checksum sidecars to write next to the zip (comma separated, empty for none)")
+    parser.add_argument('--delete-rom', action='store_true', default=_env_flag('DELETE_ROM_AFTER_EXTRACT'),
+                        help="Delete the ROM zip once everything is extracted")
+    parser.add_argument('--prune-super', action='store_true', default=_env_flag('PRUNE_SUPER_SOURCES'),
+                        help="super: delete the logical images once super.img is built")
+    parser.add_argument('--super-size', default=env('SUPER_PARTITION_SIZE') or 'auto',
+                        help="super: device size of super.img, e.g. 9G (default: auto)")
+    parser.add_argument('--platform-tools', default=env('PLATFORM_TOOLS_URL') or PLATFORM_TOOLS_URL,
+                        help="super: platform-tools zip to bundle")
+    args = parser.parse_args()
+    args.allow = parse_patterns(args.allow)
+    args.deny = parse_patterns(args.deny)
+    args.checksums = [name.strip() for name in args.checksums.split(',') if name.strip()]
+
+    events = None
+    if args.progress == '-':
+        events = sys.stderr
+    elif args.progress:
+        events = open(args.progress, 'w')
+    progress = Progress(events)
+    progress.log(f"=== Converting to {args.target.capitalize()} ROM ===")
+    progress.log(f"Input ROM: {args.rom}")
+    progress.log(f"Output directory: {os.path.abspath(args.output_dir)}")
+    progress.emit('begin', target=args.target, rom=args.rom)
+    try:
+        output, timings = convert(args.target, args.rom, os.path.abspath(args.output_dir), args, progress,
+                                  args.work_dir)
+    except (OSError, ValueError, zipfile.BadZipFile, PayloadError, LpError, SparseError, ZipStreamError,
+            ConversionError) as e:
+        progress.emit('error', error=str(e))
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    progress.log("=== Conversion Complete ===")
+    for name, seconds in timings.items():
+        progress.log(f"  {name}: {seconds:.1f}s")
+    progress.log(f"Output file: {output} ({format_size(os.path.getsize(output))})")
+    progress.emit('done', output=output, timings={name: round(seconds, 3) for name, seconds in timings.items()})
+    if events not in (None, sys.stderr):
+        events.close()
+
+if __name__ == '__main__':
+    main()
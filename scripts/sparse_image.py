@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Android sparse and raw image access without conversion
+Both image kinds expose their content as segments (data ranges of the
+backing file, fills and zeros; holes in raw files are found with
+SEEK_HOLE/SEEK_DATA), so callers can stream or copy them without a simg2img
+round trip, and sparse output is written straight from those segments
+"""
+import io
+import os
+import sys
+import mmap
+import struct
+import argparse
+from bisect import bisect_right
+
+SPARSE_MAGIC = 0xED26FF3A
+SPARSE_HEADER = struct.Struct('<IHHHHIIII')
+CHUNK_HEADER = struct.Struct('<HHII')
+CHUNK_RAW = 0xCAC1
+CHUNK_FILL = 0xCAC2
+CHUNK_DONT_CARE = 0xCAC3
+CHUNK_CRC32 = 0xCAC4
+
+# Segment kinds: ('data', length, file_offset), ('fill', length, 4 byte
+# pattern), ('zero', length, None)
+DATA = 'data'
+FILL = 'fill'
+ZERO = 'zero'
+
+COPY_CHUNK = 8 * 1024 * 1024
+# Bytes read at a time when scanning data for fill blocks
+SCAN_CHUNK = 4 * 1024 * 1024
+
+
+class SparseError(Exception):
+    """Raised for malformed sparse images or out of range reads."""
+
+
+def is_sparse(path):
+    with open(path, 'rb') as f:
+        header = f.read(4)
+    return len(header) == 4 and struct.unpack('<I', header)[0] == SPARSE_MAGIC
+
+
+class _Image:
+    """Shared read helpers; subclasses provide ``size`` and ``segments``."""
+
+    path = None
+    _map = None
+
+    @property
+    def map(self):
+        """Read-only mmap of the backing file (created on first use)."""
+        if self._map is None:
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _check_range(self, offset, length):
+        if offset < 0 or length < 0 or offset + length > self.size:
+            raise SparseError(f"Range {offset}+{length} outside image of {self.size} bytes")
+
+    def read(self, offset, length):
+        """Bytes of the expanded image at offset."""
+        parts = []
+        for kind, size, value in self.segments(offset, length):
+            parts.append(segment_bytes(self.map, kind, size, value))
+        return b''.join(parts)
+
+    def stream(self):
+        """Seekable file object over the expanded (raw) content."""
+        return io.BufferedReader(ImageStream(self), COPY_CHUNK)
+
+    @property
+    def data_size(self):
+        """Bytes actually backed by data (excluding zero runs and fills)."""
+        return sum(length for kind, length, _ in self.segments() if kind == DATA)
+
+
+class RawImage(_Image):
+    """A plain image file; holes are reported as zero segments."""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+
+    def segments(self, offset=0, length=None):
+        if length is None:
+            length = self.size - offset
+        self._check_range(offset, length)
+        if not length:
+            return
+        if not hasattr(os, 'SEEK_DATA'):
+            yield DATA, length, offset
+            return
+        end = offset + length
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            while offset < end:
+                try:
+                    data = min(os.lseek(fd, offset, os.SEEK_DATA), end)
+                except OSError:
+                    # ENXIO: nothing but hole up to EOF
+                    data = end
+                if data > offset:
+                    yield ZERO, data - offset, None
+                    offset = data
+                    continue
+                try:
+                    hole = min(os.lseek(fd, offset, os.SEEK_HOLE), end)
+                except OSError:
+                    hole = end
+                yield DATA, hole - offset, offset
+                offset = hole
+        finally:
+            os.close(fd)
+
+
+class SparseImage(_Image):
+    """Android sparse image, indexed by its chunk table."""
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = []
+        self._chunks = []
+        with open(path, 'rb') as f:
+            header = f.read(SPARSE_HEADER.size)
+            if len(header) < SPARSE_HEADER.size:
+                raise SparseError("Truncated sparse header")
+            (magic, major, _minor, file_hdr_sz, chunk_hdr_sz,
+             self.block_size, total_blocks, total_chunks, _checksum) = SPARSE_HEADER.unpack(header)
+            if magic != SPARSE_MAGIC or major != 1:
+                raise SparseError("Not an Android sparse image (v1)")
+            self.size = total_blocks * self.block_size
+
+            pos = file_hdr_sz
+            out = 0
+            for _ in range(total_chunks):
+                f.seek(pos)
+                raw = f.read(CHUNK_HEADER.size)
+                if len(raw) < CHUNK_HEADER.size:
+                    raise SparseError("Truncated chunk header")
+                chunk_type, _reserved, blocks, total_sz = CHUNK_HEADER.unpack(raw)
+                data_pos = pos + chunk_hdr_sz
+                length = blocks * self.block_size
+                if chunk_type == CHUNK_RAW:
+                    self._add(out, DATA, length, data_pos)
+                elif chunk_type == CHUNK_FILL:
+                    f.seek(data_pos)
+                    pattern = f.read(4)
+                    self._add(out, ZERO if pattern == b'\0' * 4 else FILL, length, pattern)
+                elif chunk_type == CHUNK_DONT_CARE:
+                    self._add(out, ZERO, length, None)
+                elif chunk_type != CHUNK_CRC32:
+                    raise SparseError(f"Unknown chunk type {chunk_type:#x}")
+                out += length
+                pos += total_sz
+            if out != self.size:
+                raise SparseError(f"Chunks cover {out} bytes, header says {self.size}")
+
+    def _add(self, out, kind, length, value):
+        if length:
+            self._offsets.append(out)
+            self._chunks.append((kind, length, value))
+
+    def segments(self, offset=0, length=None):
+        if length is None:
+            length = self.size - offset
+        self._check_range(offset, length)
+        index = bisect_right(self._offsets, offset) - 1
+        end = offset + length
+        while offset < end:
+            start = self._offsets[index]
+            kind, size, value = self._chunks[index]
+            skip = offset - start
+            take = min(size - skip, end - offset)
+            if kind == DATA:
+                value += skip
+            elif kind == FILL:
+                # Keep the pattern aligned to the chunk start
+                value = rotate(value, skip)
+            yield kind, take, value
+            offset += take
+            index += 1
+
+
+class ImageStream(io.RawIOBase):
+    """Read-only, seekable raw view of an image (sparse images expand on the fly)."""
+
+    def __init__(self, image):
+        super().__init__()
+        self.image = image
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence == io.SEEK_END:
+            offset += self.image.size
+        if offset < 0:
+            raise ValueError("Negative seek position")
+        self.pos = offset
+        return self.pos
+
+    def readinto(self, buffer):
+        length = min(len(buffer), max(0, self.image.size - self.pos))
+        if not length:
+            return 0
+        data = self.image.read(self.pos, length)
+        buffer[:length] = data
+        self.pos += length
+        return length
+
+
+def open_image(path):
+    """SparseImage or RawImage depending on the file's magic."""
+    return SparseImage(path) if is_sparse(path) else RawImage(path)
+
+
+def segment_bytes(source_map, kind, length, value):
+    """Materialize one segment (data comes from the backing mmap)."""
+    if kind == DATA:
+        return source_map[value:value + length]
+    if kind == FILL:
+        return (value * (length // 4 + 1))[:length]
+    return bytes(length)
+
+
+def write_segments(source_path, segments, out_path):
+    """Write segments to a new raw file, leaving zero runs as holes.
+
+    Data ranges are copied in-kernel with copy_file_range where available.
+    Returns the number of bytes written (excluding holes).
+    """
+    src = os.open(source_path, os.O_RDONLY)
+    dst = os.open(out_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        end, written = copy_segments(src, segments, dst, 0)
+        os.ftruncate(dst, end)
+    finally:
+        os.close(src)
+        os.close(dst)
+    return written
+
+
+def copy_segments(src, segments, dst, pos):
+    """Write segments into dst at pos; return (end position, bytes written)."""
+    written = 0
+    for kind, length, value in segments:
+        if kind == DATA:
+            copy_range(src, value, dst, pos, length)
+            written += length
+        elif kind == FILL:
+            write_fill(dst, value, pos, length)
+            written += length
+        pos += length
+    return pos, written
+
+
+def write_fill(dst, pattern, pos, length):
+    """Write a repeated 4 byte pattern."""
+    block = pattern * (min(length, COPY_CHUNK) // 4 + 1)
+    done = 0
+    while done < length:
+        take = min(COPY_CHUNK, length - done)
+        os.pwrite(dst, block[:take], pos + done)
+        done += take
+
+
+def uniform_pattern(block):
+    """The 4 byte pattern a block repeats, or None."""
+    pattern = block[:4]
+    if block[-4:] != pattern or block != pattern * (len(block) // 4):
+        return None
+    return bytes(pattern)
+
+
+def detect_fills(src, segments, block_size, rel=0):
+    """Split data segments into data and block aligned fill/zero runs.
+
+    ``rel`` is the output position the segments start at, so detected
+    runs line up with output blocks. Only data is read; holes pass through.
+    """
+    for kind, length, value in segments:
+        if kind != DATA or length < block_size:
+            yield kind, length, value
+            rel += length
+            continue
+        head = -rel % block_size
+        if head:
+            yield DATA, head, value
+        pos = value + head
+        end = value + length
+        body_end = pos + (end - pos) // block_size * block_size
+        run_kind = None
+        run_start = pos
+        run_pattern = None
+        while pos < body_end:
+            window = os.pread(src, min(SCAN_CHUNK, body_end - pos), pos)
+            if not window:
+                raise SparseError("Unexpected end of source file")
+            for i in range(0, len(window), block_size):
+                pattern = uniform_pattern(window[i:i + block_size])
+                if pattern is None:
+                    block_kind = DATA
+                elif pattern == b'\0' * 4:
+                    block_kind = ZERO
+                else:
+                    block_kind = FILL
+                if block_kind != run_kind or (block_kind == FILL and pattern != run_pattern):
+                    if run_kind is not None:
+                        yield _run(run_kind, pos + i - run_start, run_start, run_pattern)
+                    run_kind, run_start, run_pattern = block_kind, pos + i, pattern
+            pos += len(window)
+        if run_kind is not None:
+            yield _run(run_kind, body_end - run_start, run_start, run_pattern)
+        if end > body_end:
+            yield DATA, end - body_end, body_end
+        rel += length
+
+
+def _run(kind, length, start, pattern):
+    if kind == DATA:
+        return DATA, length, start
+    if kind == FILL:
+        return FILL, length, pattern
+    return ZERO, length, None
+
+
+def rotate(pattern, offset):
+    """Fill pattern as seen from offset bytes into the fill."""
+    offset %= 4
+    return pattern[offset:] + pattern[:offset]
+
+
+def copy_range(src, src_offset, dst, dst_offset, length):
+    """Copy bytes between file descriptors, in-kernel when possible."""
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while length:
+                copied = os.copy_file_range(src, dst, min(length, 1 << 30), src_offset, dst_offset)
+                if copied == 0:
+                    raise SparseError("Unexpected end of source file")
+                src_offset += copied
+                dst_offset += copied
+                length -= copied
+            return
+        except OSError:
+            # Cross-filesystem copies are refused on older kernels
+            pass
+    while length:
+        chunk = os.pread(src, min(length, COPY_CHUNK), src_offset)
+        if not chunk:
+            raise SparseError("Unexpected end of source file")
+        os.pwrite(dst, chunk, dst_offset)
+        src_offset += len(chunk)
+        dst_offset += len(chunk)
+        length -= len(chunk)
+
+
+class SparseWriter:
+    """Sequential Android sparse image writer.
+
+    Callers append content in order: ``data`` for literal bytes, ``fill``,
+    ``skip`` (DONT_CARE, keeps whatever the device has) and ``segments``,
+    which copies segments from a source file and turns block aligned
+    fill/zero runs into FILL chunks. With ``detect_fills`` uniform blocks
+    inside data are found too (like img2simg); ``holes_as_dont_care``
+    writes zero runs as DONT_CARE instead of zero FILL chunks (img2simg -s).
+    The header is written on ``close``.
+    """
+
+    def __init__(self, path, block_size=4096, detect_fills=True, holes_as_dont_care=False):
+        self.path = path
+        self.block_size = block_size
+        self.detect_fills = detect_fills
+        self.holes_as_dont_care = holes_as_dont_care
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.pos = SPARSE_HEADER.size
+        self.blocks = 0
+        self.chunks = 0
+
+    @property
+    def size(self):
+        """Expanded image size so far."""
+        return self.blocks * self.block_size
+
+    def _blocks(self, length):
+        if length % self.block_size:
+            raise SparseError(f"{length} bytes is not a multiple of the {self.block_size} byte block size")
+        return length // self.block_size
+
+    def _chunk(self, chunk_type, length, body_size):
+        blocks = self._blocks(length)
+        os.pwrite(self.fd, CHUNK_HEADER.pack(chunk_type, 0, blocks, CHUNK_HEADER.size + body_size), self.pos)
+        self.pos += CHUNK_HEADER.size
+        self.blocks += blocks
+        self.chunks += 1
+
+    def skip(self, length):
+        if length:
+            self._chunk(CHUNK_DONT_CARE, length, 0)
+
+    def fill(self, pattern, length):
+        if length:
+            self._chunk(CHUNK_FILL, length, 4)
+            os.pwrite(self.fd, pattern, self.pos)
+            self.pos += 4
+
+    def data(self, data):
+        """Literal bytes, zero padded to a whole block."""
+        data = bytes(data) + bytes(-len(data) % self.block_size)
+        if data:
+            self._chunk(CHUNK_RAW, len(data), len(data))
+            os.pwrite(self.fd, data, self.pos)
+            self.pos += len(data)
+
+    def _raw(self, src, pieces):
+        length = sum(piece[1] for piece in pieces)
+        if not length:
+            return
+        self._chunk(CHUNK_RAW, length, length)
+        self.pos, _ = copy_segments(src, [
+            (FILL, size, b'\0' * 4) if kind == ZERO else (kind, size, value)
+            for kind, size, value in pieces
+        ], self.fd, self.pos)
+
+    def segments(self, src, segments):
+        """Append segments read from fd src, padding the end to a block."""
+        bs = self.block_size
+        run = []
+        rel = 0
+        if self.detect_fills:
+            segments = detect_fills(src, segments, bs)
+        for kind, length, value in segments:
+            if kind == DATA:
+                run.append((kind, length, value))
+                rel += length
+                continue
+            pattern = b'\0' * 4 if kind == ZERO else value
+            head = min(length, -rel % bs)
+            body = (length - head) // bs * bs
+            tail = length - head - body
+            if head:
+                run.append((FILL, head, pattern))
+            if body:
+                self._raw(src, run)
+                run = []
+                if kind == ZERO and self.holes_as_dont_care:
+                    self.skip(body)
+                else:
+                    self.fill(rotate(pattern, head), body)
+            if tail:
+                run.append((FILL, tail, rotate(pattern, head + body)))
+            rel += length
+        pad = -rel % bs
+        if pad:
+            run.append((ZERO, pad, None))
+        self._raw(src, run)
+        return rel + pad
+
+    def close(self):
+        if self.fd is None:
+            return
+        header = SPARSE_HEADER.pack(SPARSE_MAGIC, 1, 0, SPARSE_HEADER.size, CHUNK_HEADER.size,
+                                    self.block_size, self.blocks, self.chunks, 0)
+        os.pwrite(self.fd, header, 0)
+        os.ftruncate(self.fd, self.pos)
+        os.close(self.fd)
+        self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert between raw and Android sparse images")
+    parser.add_argument('input', help="Raw or sparse image")
+    parser.add_argument('output')
+    parser.add_argument('--sparse', action='store_true', help="Write sparse output (default: raw)")
+    parser.add_argument('--block-size', type=int, default=4096)
+    parser.add_argument('--dont-care-holes', action='store_true',
+                        help="Sparse output: leave zero runs as DONT_CARE instead of zero fills")
+    args = parser.parse_args()
+
+    try:
+        with open_image(args.input) as image:
+            if args.sparse:
+                with SparseWriter(args.output, args.block_size,
+                                  holes_as_dont_care=args.dont_care_holes) as writer:
+                    src = os.open(image.path, os.O_RDONLY)
+                    try:
+                        writer.segments(src, image.segments())
+                    finally:
+                        os.close(src)
+                print(f"{image.size} bytes -> {writer.pos} bytes sparse ({writer.chunks} chunks)")
+            else:
+                written = write_segments(image.path, image.segments(), args.output)
+                print(f"{image.size} bytes, {written} bytes of data written")
+    except (OSError, SparseError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
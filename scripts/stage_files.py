@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Stage files into a directory without copying their data when possible
+Tries rename (with --move), hardlink and reflink (FICLONE) before falling
+back to a hole-preserving copy, and reports how many bytes were not written
+"""
+import os
+import sys
+import errno
+import fcntl
+import argparse
+from sparse_image import RawImage, write_segments
+
+# _IOW(0x94, 9, int) from linux/fs.h
+FICLONE = 0x40049409
+
+METHODS = ('move', 'hardlink', 'reflink', 'copy')
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def reflink(src, dst):
+    """Clone src into a new file dst (btrfs, XFS, ...); raises OSError if unsupported."""
+    with open(src, 'rb') as fsrc:
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            fcntl.ioctl(fd, FICLONE, fsrc.fileno())
+        except OSError:
+            os.close(fd)
+            os.remove(dst)
+            raise
+        os.close(fd)
+
+
+def stage_file(src, dest, move=False, hardlink=True):
+    """Place src at dest (a directory or file path).
+
+    Returns (method, size, bytes_written); only a copy writes data.
+    """
+    if os.path.isdir(dest):
+        dest = os.path.join(dest, os.path.basename(src))
+    size = os.path.getsize(src)
+    if os.path.exists(dest) and os.path.samefile(src, dest):
+        # Already in place (same path or a hardlink); unlinking would lose it
+        if move and os.path.abspath(src) != os.path.abspath(dest):
+            os.remove(src)
+            return 'move', size, 0
+        return 'hardlink', size, 0
+    if os.path.lexists(dest):
+        os.remove(dest)
+
+    if move:
+        try:
+            os.rename(src, dest)
+            return 'move', size, 0
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+    method = None
+    written = 0
+    if hardlink:
+        try:
+            os.link(src, dest)
+            method = 'hardlink'
+        except OSError:
+            pass
+    if method is None:
+        try:
+            reflink(src, dest)
+            method = 'reflink'
+        except OSError:
+            pass
+    if method is None:
+        with RawImage(src) as image:
+            written = write_segments(src, image.segments(), dest)
+        method = 'copy'
+
+    if move:
+        os.remove(src)
+    return method, size, written
+
+
+def stage_files(sources, dest_dir, move=False, hardlink=True, log=print):
+    """Stage several files into dest_dir and summarize what it cost."""
+    os.makedirs(dest_dir, exist_ok=True)
+    counts = dict.fromkeys(METHODS, 0)
+    total = 0
+    written = 0
+    for src in sources:
+        method, size, file_written = stage_file(src, dest_dir, move, hardlink)
+        log(f"  {os.path.basename(src)}: {method} ({format_size(size)})")
+        counts[method] += 1
+        total += size
+        written += file_written
+
+    methods = ', '.join(f"{count} {method}" for method, count in counts.items() if count)
+    log(f"Staged {len(sources)} files ({format_size(total)}): {methods or 'nothing to do'}; "
+        f"saved {format_size(total - written)} of writes")
+    return {'files': len(sources), 'bytes': total, 'written': written, 'saved': total - written, **counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage files into a directory without copying when possible")
+    parser.add_argument('dest_dir')
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--move', action='store_true', help="Sources are not needed afterwards")
+    parser.add_argument('--no-hardlink', action='store_true',
+                        help="Never share an inode with the source (reflink or copy only)")
+    args = parser.parse_args()
+
+    try:
+        stage_files(args.files, args.dest_dir, move=args.move, hardlink=not args.no_hardlink)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+@echo off
+title Super ROM Flasher
+echo.
+echo.**********************************************************************
+echo.
+echo.                    Super ROM Flasher                      
+echo.              Automated Fastboot Flash Script
+echo.
+echo.**********************************************************************
+echo.
+
+cd %~dp0
+set fastboot=platform-tools\fastboot.exe
+
+:: Check if fastboot exists
+if not exist "%fastboot%" (
+    echo [ERROR] fastboot not found in platform-tools!
+    echo Please re-download the ROM package
+    pause
+    exit /B 1
+)
+
+echo.
+echo Checking device connection...
+%fastboot% devices
+if errorlevel 1 (
+    echo.
+    echo [ERROR] No device detected in fastboot mode!
+    echo.
+    echo Please:
+    echo  1. Boot your device into fastboot mode
+    echo  2. Connect USB cable
+    echo  3. Run this script again
+    echo.
+    pause
+    exit /b 1
+)
+
+echo.
+echo [WARNING] This will flash your device!
+echo All data will be erased if you choose to wipe.
+echo.
+pause
+
+echo.
+echo.************************      START FLASH     ************************
+echo.
+
+:: Set active slot to A
+echo [*] Setting active slot to A...
+%fastboot% --set-active=a
+
+:: Flash physical partitions (bootloader mode)
+echo.
+echo ========== Flashing Physical Partitions ==========
+echo.
+
+:: Physical partitions that can be flashed in bootloader mode
+set PHYSICAL_PARTITIONS=boot dtbo vbmeta vendor_boot init_boot recovery abl aop aop_config bluetooth cpucp devcfg dsp engineering_cdt featenabler hyp imagefv keymaster modem oplus_sec oplusstanvbk qupfw shrm splash tz uefi uefisecapp cpucp_dtb vbmeta_vendor xbl xbl_config xbl_ramdump
+
+set PARTITION_COUNT=0
+for %%P in (%PHYSICAL_PARTITIONS%) do (
+    if exist %%P.img (
+        set /a PARTITION_COUNT+=1
+        echo [!PARTITION_COUNT!] Flashing %%P...
+        if "%%P"=="vbmeta" (
+            %fastboot% --disable-verity --disable-verification flash %%P %%P.img
+        ) else if "%%P"=="vbmeta_vendor" (
+            %fastboot% --disable-verity --disable-verification flash %%P %%P.img
+        ) else (
+            %fastboot% flash %%P %%P.img
+        )
+    )
+)
+
+:: Flash super.img if it exists
+if exist super.img (
+    echo.
+    echo [SUPER] Flashing super.img...
+    %fastboot% flash super super.img
+    echo Super image flashed successfully!
+    goto :wipe_prompt
+)
+
+:: If no super.img, flash logical partitions in fastbootd
+echo.
+echo ========== Rebooting to Fastbootd ==========
+echo.
+echo [*] Rebooting to fastbootd mode...
+%fastboot% reboot fastboot
+
+echo.
+echo  #################################################
+echo  # IMPORTANT: Wait for fastbootd mode           #
+echo  # The phone screen will show "Fastbootd"       #
+echo  # Then press any key to continue...            #
+echo  #################################################
+echo.
+pause
+
+:: Flash logical partitions (fastbootd mode)
+echo.
+echo ========== Flashing Logical Partitions ==========
+echo.
+
+:: Logical partitions that go in super
+set LOGICAL_PARTITIONS=system system_ext product vendor odm system_dlkm vendor_dlkm my_product my_engineering my_stock my_carrier my_region my_bigball my_heytap my_manifest
+
+for %%P in (%LOGICAL_PARTITIONS%) do (
+    if exist %%P.img (
+        echo [LOGICAL] Flashing %%P...
+        %fastboot% flash %%P %%P.img
+    )
+)
+
+:wipe_prompt
+echo.
+echo.********************** CHECK ABOVE FOR ERRORS **************************
+echo.************** IF ERRORS, DO NOT BOOT INTO SYSTEM **********************
+echo.
+
+:: Ask about data wipe
+choice /C YN /M "Do you want to wipe data (factory reset)?"
+
+if errorlevel 2 (
+    echo.
+    echo *********************** SKIPPING DATA WIPE ****************************
+    echo ***** Flashing complete. Hit any key to reboot the phone *****
+    pause
+    %fastboot% reboot
+    exit /B 0
+)
+
+if errorlevel 1 (
+    echo.
+    echo ****************** WIPING DATA *****************
+    %fastboot% -w
+    echo.
+    echo Data wiped successfully!
+    echo.
+    echo ***** Flashing complete. Hit any key to reboot the phone *****
+    pause
+    %fastboot% reboot
+    exit /B 0
+)
+
+pause
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Write zip archives straight from source files and streams
+Entries are read once and written sequentially into the final archive, with
+ZIP64 records only where sizes or offsets need them, so packaging never
+needs a staging copy of the images. Deflate runs on all cores in
+independent blocks, and each entry can be stored or deflated depending on
+how compressible a sample of it is. Checksums of the archive can be
+computed as it is written, so no extra read pass is needed for them
+"""
+import io
+import os
+import sys
+import time
+import zlib
+import struct
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from lpunpack import LpError, SuperImage
+from sparse_image import SparseError
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+END_RECORD = struct.Struct('<IHHHHIIH')
+ZIP64_END_RECORD = struct.Struct('<IQHHIIQQQQ')
+ZIP64_LOCATOR = struct.Struct('<IIQI')
+LOCAL_HEADER_MAGIC = 0x04034b50
+CENTRAL_HEADER_MAGIC = 0x02014b50
+DATA_DESCRIPTOR_MAGIC = 0x08074b50
+END_RECORD_MAGIC = 0x06054b50
+ZIP64_END_RECORD_MAGIC = 0x06064b50
+ZIP64_LOCATOR_MAGIC = 0x07064b50
+ZIP64_EXTRA_ID = 0x0001
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+VERSION_DEFAULT = 20
+VERSION_ZIP64 = 45
+CREATOR_UNIX = 3
+
+ZIP64_LIMIT = 0xFFFFFFFF
+# Deflate can grow incompressible data slightly; reserve ZIP64 early
+ZIP64_COMPRESSED_MARGIN = 64 * 1024 * 1024
+READ_CHUNK = 8 * 1024 * 1024
+# Unit of parallel deflate; each block is primed with the 32 KiB before it
+DEFLATE_BLOCK = 1024 * 1024
+DEFLATE_WINDOW = 32 * 1024
+# Empty final block that terminates a stream of sync-flushed blocks
+DEFLATE_END = b'\x03\x00'
+
+# Compression policy per entry: store, deflate, or decide from a sample
+STORE = 'store'
+DEFLATE = 'deflate'
+AUTO = 'auto'
+COMPRESS_MODES = (STORE, DEFLATE, AUTO)
+PROBE_SAMPLES = 16
+PROBE_SAMPLE_SIZE = 64 * 1024
+# Deflate only pays off if it saves at least this much of the entry
+PROBE_MIN_SAVING = 0.05
+
+# Archive checksums; blake3 and xxh3 need their optional packages
+CHECKSUMS = ('md5', 'sha256', 'blake3', 'xxh3')
+DEFAULT_CHECKSUMS = ('md5', 'sha256')
+
+
+class ZipStreamError(Exception):
+    """Raised when an entry does not fit the header written for it."""
+
+
+def dos_datetime(mtime):
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+class ZipEntry:
+    __slots__ = ('name', 'flags', 'method', 'dos_time', 'dos_date', 'crc', 'compressed_size',
+                 'size', 'offset', 'mode', 'zip64')
+
+
+def new_hash(name):
+    if name in ('md5', 'sha256'):
+        return hashlib.new(name)
+    if name == 'blake3' and blake3 is not None:
+        return blake3.blake3()
+    if name == 'xxh3' and xxhash is not None:
+        return xxhash.xxh3_64()
+    if name in CHECKSUMS:
+        package = 'blake3' if name == 'blake3' else 'xxhash'
+        raise ZipStreamError(f"{name} checksums need the '{package}' package")
+    raise ZipStreamError(f"Unknown checksum {name}")
+
+
+class HashingFile:
+    """Write-only file wrapper that hashes everything written through it.
+
+    It reports itself as unseekable, so the zip writer never goes back to
+    patch a header and the digests stay those of the final file.
+    """
+
+    def __init__(self, f, algorithms):
+        self.f = f
+        self.hashes = {name: new_hash(name) for name in algorithms}
+
+    def write(self, data):
+        for digest in self.hashes.values():
+            digest.update(data)
+        return self.f.write(data)
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+    def hexdigests(self):
+        return {name: digest.hexdigest() for name, digest in self.hashes.items()}
+
+
+def write_checksums(path, digests):
+    """Write <path>.<algorithm> sidecars in md5sum/sha256sum format."""
+    written = []
+    for name, digest in digests.items():
+        sidecar = f"{path}.{name}"
+        with open(sidecar, 'w') as f:
+            f.write(f"{digest}  {os.path.basename(path)}\n")
+        written.append(sidecar)
+    return written
+
+
+def compressibility(f, size):
+    """Estimated deflated/original size ratio from samples spread over a seekable file."""
+    start = f.tell()
+    sample_count = min(PROBE_SAMPLES, max(1, size // PROBE_SAMPLE_SIZE))
+    step = size // sample_count
+    original = 0
+    deflated = 0
+    try:
+        for i in range(sample_count):
+            f.seek(start + i * step)
+            sample = f.read(PROBE_SAMPLE_SIZE)
+            compressor = zlib.compressobj(1, zlib.DEFLATED, -15)
+            original += len(sample)
+            deflated += len(compressor.compress(sample)) + len(compressor.flush())
+    finally:
+        f.seek(start)
+    return deflated / original if original else 1.0
+
+
+class ZipStreamWriter:
+    """Sequential zip writer.
+
+    On a seekable output each local header is patched with the real CRC and
+    sizes after its data is written; on a pipe a data descriptor follows the
+    data instead. ``add`` accepts bytes, a file path or a readable stream.
+
+    With more than one worker, entries are deflated as independent
+    sync-flushed blocks on a thread pool (zlib releases the GIL) and joined
+    into one ordinary deflate stream, so any unzip, TWRP included, reads it.
+
+    ``checksums`` names digests to compute over the archive while it is
+    written (see ``digests``); entries then end in data descriptors.
+    """
+
+    def __init__(self, path_or_file, compresslevel=6, workers=None, checksums=()):
+        if isinstance(path_or_file, (str, bytes, os.PathLike)):
+            self.f = open(path_or_file, 'wb')
+            self._owns_file = True
+        else:
+            self.f = path_or_file
+            self._owns_file = False
+        self.hashing = None
+        if checksums:
+            try:
+                self.hashing = self.f = HashingFile(self.f, checksums)
+            except ZipStreamError:
+                if self._owns_file:
+                    self.f.close()
+                raise
+        self.seekable = self.f.seekable()
+        self.compresslevel = compresslevel
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(self.workers) if self.workers > 1 else None
+        self.entries = []
+        self.offset = 0
+        self.closed = False
+
+    def _write(self, data):
+        self.f.write(data)
+        self.offset += len(data)
+
+    def _compressor(self):
+        return zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15)
+
+    def add(self, arcname, source, compress=False, mode=0o644, mtime=None, size=None):
+        """Add one entry; ``size`` is required up front only to skip ZIP64 for streams.
+
+        ``compress`` is True/False or AUTO, which deflates only entries that a
+        sample shows to be compressible.
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            data = bytes(source)
+            if compress == AUTO:
+                compress = self._worth_deflating(io.BytesIO(data), len(data))
+            return self._add_chunks(arcname, [data], compress, mode, mtime or time.time(), len(data))
+        if isinstance(source, (str, os.PathLike)):
+            st = os.stat(source)
+            with open(source, 'rb', buffering=0) as f:
+                if compress == AUTO:
+                    compress = self._worth_deflating(f, st.st_size)
+                return self._add_chunks(arcname, self._read_chunks(f), compress,
+                                        st.st_mode & 0o777, mtime or st.st_mtime, st.st_size)
+        if compress == AUTO:
+            # Without seeking there is nothing to sample ahead of writing
+            compress = size is not None and source.seekable() and self._worth_deflating(source, size)
+        return self._add_chunks(arcname, self._read_chunks(source), compress, mode, mtime or time.time(), size)
+
+    @staticmethod
+    def _worth_deflating(f, size):
+        return compressibility(f, size) <= 1 - PROBE_MIN_SAVING
+
+    @staticmethod
+    def _read_chunks(f):
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+    def _start_entry(self, arcname, compress, mode, mtime, size):
+        entry = ZipEntry()
+        entry.name = arcname.replace(os.sep, '/').lstrip('/')
+        entry.method = ZIP_DEFLATED if compress else ZIP_STORED
+        entry.flags = 0 if entry.name.isascii() else FLAG_UTF8
+        if not self.seekable:
+            entry.flags |= FLAG_DATA_DESCRIPTOR
+        entry.dos_time, entry.dos_date = dos_datetime(mtime)
+        entry.mode = mode
+        entry.offset = self.offset
+        limit = ZIP64_LIMIT - (ZIP64_COMPRESSED_MARGIN if compress else 0)
+        entry.zip64 = size is None or size >= limit
+        return entry
+
+    def _local_header(self, entry, crc=0, compressed_size=0, size=0):
+        name = entry.name.encode()
+        if entry.zip64:
+            extra = struct.pack('<HHQQ', ZIP64_EXTRA_ID, 16, size, compressed_size)
+            compressed_size = size = ZIP64_LIMIT
+        else:
+            extra = b''
+        version = VERSION_ZIP64 if entry.zip64 else VERSION_DEFAULT
+        return LOCAL_HEADER.pack(LOCAL_HEADER_MAGIC, version, entry.flags, entry.method, entry.dos_time,
+                                 entry.dos_date, crc, compressed_size, size, len(name), len(extra)) + name + extra
+
+    def _add_chunks(self, arcname, chunks, compress, mode, mtime, size):
+        entry = self._start_entry(arcname, compress, mode, mtime, size)
+        self._write(self._local_header(entry))
+        crc = 0
+        total = 0
+        written = 0
+
+        def counted():
+            # CRC of the input is cheap next to deflate, so it stays inline
+            nonlocal crc, total
+            for chunk in chunks:
+                crc = zlib.crc32(chunk, crc)
+                total += len(chunk)
+                yield chunk
+
+        if compress and self._pool:
+            output = self._deflate_parallel(counted())
+        elif compress:
+            output = self._deflate(counted())
+        else:
+            output = counted()
+        for chunk in output:
+            self._write(chunk)
+            written += len(chunk)
+        return self._finish_entry(entry, crc, written, total)
+
+    def _deflate(self, chunks):
+        compressor = self._compressor()
+        for chunk in chunks:
+            chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+
+    def _deflate_block(self, data, window):
+        """Deflate one block so it can be concatenated with its neighbours."""
+        if window:
+            compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15, zdict=window)
+        else:
+            compressor = self._compressor()
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def _deflate_parallel(self, chunks):
+        """Deflate blocks on the pool and yield them in order, a bounded number in flight."""
+        pending = deque()
+        window = b''
+        for chunk in chunks:
+            view = memoryview(chunk)
+            for start in range(0, len(view), DEFLATE_BLOCK):
+                block = view[start:start + DEFLATE_BLOCK]
+                pending.append(self._pool.submit(self._deflate_block, block, window))
+                window = bytes(block[-DEFLATE_WINDOW:])
+                while len(pending) > 2 * self.workers:
+                    yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+        yield DEFLATE_END
+
+    def _finish_entry(self, entry, crc, compressed_size, size):
+        """Record CRC and sizes once the entry's data has been written."""
+        if not entry.zip64 and (size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT):
+            raise ZipStreamError(f"{entry.name}: grew past 4 GiB without a ZIP64 header")
+        entry.crc = crc
+        entry.compressed_size = compressed_size
+        entry.size = size
+        if self.seekable:
+            end = self.f.tell()
+            self.f.seek(entry.offset)
+            self.f.write(self._local_header(entry, crc, compressed_size, size))
+            self.f.seek(end)
+        elif entry.zip64:
+            self._write(struct.pack('<IIQQ', DATA_DESCRIPTOR_MAGIC, crc, compressed_size, size))
+        else:
+            self._write(struct.pack('<IIII', DATA_DESCRIPTOR_MAGIC, crc, compressed_size, size))
+        self.entries.append(entry)
+        return entry
+
+    def add_path(self, path, arcname=None, compress=False):
+        """Add a file, or a directory's files relative to it."""
+        if not os.path.isdir(path):
+            return [self.add(arcname or os.path.basename(path), path, compress)]
+        added = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                relative = os.path.relpath(full, path)
+                if arcname:
+                    relative = os.path.join(arcname, relative)
+                added.append(self.add(relative, full, compress))
+        return added
+
+    def _central_directory(self):
+        records = []
+        for entry in self.entries:
+            name = entry.name.encode()
+            overflow = []
+            size = entry.size
+            compressed_size = entry.compressed_size
+            offset = entry.offset
+            if size >= ZIP64_LIMIT:
+                overflow.append(size)
+                size = ZIP64_LIMIT
+            if compressed_size >= ZIP64_LIMIT:
+                overflow.append(compressed_size)
+                compressed_size = ZIP64_LIMIT
+            if offset >= ZIP64_LIMIT:
+                overflow.append(offset)
+                offset = ZIP64_LIMIT
+            extra = b''
+            if overflow:
+                extra = struct.pack(f'<HH{len(overflow)}Q', ZIP64_EXTRA_ID, 8 * len(overflow), *overflow)
+            version = VERSION_ZIP64 if overflow or entry.zip64 else VERSION_DEFAULT
+            records.append(CENTRAL_HEADER.pack(
+                CENTRAL_HEADER_MAGIC, (CREATOR_UNIX << 8) | version, version, entry.flags, entry.method,
+                entry.dos_time, entry.dos_date, entry.crc, compressed_size, size, len(name), len(extra),
+                0, 0, 0, (0o100000 | entry.mode) << 16, offset,
+            ) + name + extra)
+        return b''.join(records)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        directory = self._central_directory()
+        directory_offset = self.offset
+        self._write(directory)
+        count = len(self.entries)
+        if count >= 0xFFFF or directory_offset >= ZIP64_LIMIT or len(directory) >= ZIP64_LIMIT:
+            record_offset = self.offset
+            self._write(ZIP64_END_RECORD.pack(ZIP64_END_RECORD_MAGIC, ZIP64_END_RECORD.size - 12,
+                                              (CREATOR_UNIX << 8) | VERSION_ZIP64, VERSION_ZIP64, 0, 0,
+                                              count, count, len(directory), directory_offset))
+            self._write(ZIP64_LOCATOR.pack(ZIP64_LOCATOR_MAGIC, 0, record_offset, 1))
+        self._write(END_RECORD.pack(END_RECORD_MAGIC, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                                    min(len(directory), ZIP64_LIMIT), min(directory_offset, ZIP64_LIMIT), 0))
+        if self._pool:
+            self._pool.shutdown()
+        if self._owns_file:
+            self.f.close()
+        else:
+            self.f.flush()
+
+    def digests(self):
+        """Hex digests of everything written so far, by algorithm."""
+        return self.hashing.hexdigests() if self.hashing else {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def add_super_partitions(writer, super_path, compress=False, log=print):
+    """Stream every non-empty logical partition of a super image into the zip."""
+    with SuperImage(super_path) as super_image:
+        for partition in super_image.partitions:
+            if partition.size:
+                entry = writer.add(f"{partition.name}.img", partition.stream(), compress, size=partition.size)
+                log(f"  {entry.name} ({describe(entry)}, from {os.path.basename(super_path)})")
+
+
+def describe(entry):
+    if entry.method == ZIP_DEFLATED:
+        return f"{entry.size} bytes, deflated to {entry.compressed_size}"
+    return f"{entry.size} bytes, stored"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a zip straight from files, directories and super images")
+    parser.add_argument('output', help="Zip to create ('-' for stdout)")
+    parser.add_argument('entries', nargs='+',
+                        help="FILE, DIR (its contents go to the root), NAME=FILE, or lp:SUPER_IMG "
+                             "(each logical partition as NAME.img)")
+    parser.add_argument('--compress', choices=COMPRESS_MODES, default=STORE,
+                        help="Store, deflate, or pick per entry from a compressibility sample")
+    parser.add_argument('--level', type=int, default=6, help="Deflate level")
+    parser.add_argument('--workers', type=int, help="Deflate threads (default: CPU count)")
+    parser.add_argument('--checksums', nargs='?', const=','.join(DEFAULT_CHECKSUMS),
+                        help=f"Hash the zip while writing it and write <output>.<algorithm> sidecars "
+                             f"(comma separated, from {', '.join(CHECKSUMS)}; default {','.join(DEFAULT_CHECKSUMS)})")
+    args = parser.parse_args()
+    compress = AUTO if args.compress == AUTO else args.compress == DEFLATE
+    checksums = [name.strip() for name in args.checksums.split(',') if name.strip()] if args.checksums else []
+
+    output = sys.stdout.buffer if args.output == '-' else args.output
+    log = (lambda message: print(message, file=sys.stderr)) if args.output == '-' else print
+    try:
+        with ZipStreamWriter(output, args.level, args.workers, checksums) as writer:
+            for item in args.entries:
+                if item.startswith('lp:'):
+                    add_super_partitions(writer, item[3:], compress, log)
+                    continue
+                arcname = None
+                if '=' in item and not os.path.exists(item):
+                    arcname, item = item.split('=', 1)
+                for entry in writer.add_path(item, arcname, compress):
+                    log(f"  {entry.name} ({describe(entry)})")
+        log(f"Wrote {len(writer.entries)} entries, {writer.offset} bytes")
+        for name, digest in writer.digests().items():
+            log(f"{name}: {digest}")
+        if checksums and args.output != '-':
+            write_checksums(args.output, writer.digests())
+    except (OSError, ZipStreamError, LpError, SparseError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -85,7 +85,19 @@ def check_scripts():
         'scripts/convert_to_super.sh',
         'scripts/convert_to_hybrid.sh',
         'scripts/upload_to_drive.sh',
-        'scripts/extract_rom_info.py'
+        'scripts/extract_rom_info.py',
+        'scripts/payload_manifest.py',
+        'scripts/payload_extract.py',
+        'scripts/extraction_plan.py',
+        'scripts/lpunpack.py',
+        'scripts/lpmake.py',
+        'scripts/sparse_image.py',
+        'scripts/disk_budget.py',
+        'scripts/remote_zip.py',
+        'scripts/partition_cache.py',
+        'scripts/stage_files.py',
+        'scripts/zip_stream.py',
+        'scripts/romconv.py'
     ]
     
     all_exist = True
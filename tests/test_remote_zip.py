@@ -0,0 +1,147 @@
+"""
+Tests for reading files over HTTP range requests
+"""
+import functools
+import http.client
+import http.server
+import io
+import os
+import random
+import threading
+import zipfile
+
+import pytest
+
+from remote_zip import CONNECTIONS, RangeRequestHandler, RemoteFile, RemoteZipError, list_members
+
+BLOCK_SIZE = 4096
+SIZE = 50 * BLOCK_SIZE + 123
+
+
+def start_server(directory, handler_class):
+    handler = functools.partial(handler_class, directory=directory)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture(scope='module')
+def served(tmp_path_factory):
+    """(base URL, contents of data.bin) on a local server with range support."""
+    directory = tmp_path_factory.mktemp('served')
+    data = random.Random(0).randbytes(SIZE)
+    (directory / 'data.bin').write_bytes(data)
+    with zipfile.ZipFile(directory / 'rom.zip', 'w') as zf:
+        zf.writestr('payload.bin', data[:10000])
+        zf.writestr('META-INF/com/android/metadata', 'ota-type=AB\n')
+    server = start_server(str(directory), RangeRequestHandler)
+    yield f"http://127.0.0.1:{server.server_port}", data
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def remote(served):
+    url, data = served
+    f = RemoteFile(f"{url}/data.bin", block_size=BLOCK_SIZE, readahead=4, cache_blocks=8)
+    yield f, data
+    f.close()
+
+
+def test_size(remote):
+    f, data = remote
+    assert f.size == len(data)
+    assert f.block_count == 51
+
+
+def test_random_pread(remote):
+    f, data = remote
+    rng = random.Random(1)
+    for _ in range(200):
+        offset = rng.randrange(SIZE)
+        length = rng.randrange(1, 3 * BLOCK_SIZE)
+        assert f.pread(length, offset) == data[offset:offset + length]
+
+
+def test_pread_past_end(remote):
+    f, data = remote
+    assert f.pread(100, SIZE - 10) == data[-10:]
+    assert f.pread(100, SIZE) == b''
+
+
+def test_sequential_read(remote):
+    f, data = remote
+    reader = io.BufferedReader(f, 3000)
+    chunks = []
+    while chunk := reader.read(1000):
+        chunks.append(chunk)
+    assert b''.join(chunks) == data
+
+
+def test_seek_and_read(remote):
+    f, data = remote
+    f.seek(-500, io.SEEK_END)
+    assert f.read() == data[-500:]
+    f.seek(BLOCK_SIZE - 1)
+    assert f.read(2) == data[BLOCK_SIZE - 1:BLOCK_SIZE + 1]
+    assert f.tell() == BLOCK_SIZE + 1
+
+
+def test_readahead_stays_in_window(remote):
+    f, _ = remote
+    rng = random.Random(2)
+    for _ in range(50):
+        offset = rng.randrange(SIZE)
+        f.pread(100, offset)
+        # Outside the window only fetches already running when it moved remain
+        window = range(offset // BLOCK_SIZE, offset // BLOCK_SIZE + f.readahead + 1)
+        assert len([index for index in f._inflight if index not in window]) <= CONNECTIONS
+        assert len(f._cache) <= f.cache_blocks
+
+
+def test_no_readahead(served):
+    url, data = served
+    with RemoteFile(f"{url}/data.bin", block_size=BLOCK_SIZE, readahead=0) as f:
+        assert f.pread(10, 5 * BLOCK_SIZE) == data[5 * BLOCK_SIZE:5 * BLOCK_SIZE + 10]
+        assert not f._inflight
+        assert list(f._cache) == [5]
+
+
+def test_zip_members(served):
+    url, _ = served
+    names = [info.filename for info in list_members(f"{url}/rom.zip")]
+    assert names == ['payload.bin', 'META-INF/com/android/metadata']
+
+
+def test_unsatisfiable_range(served):
+    url, _ = served
+    host, port = url[len('http://'):].split(':')
+    connection = http.client.HTTPConnection(host, int(port))
+    connection.request('GET', '/data.bin', headers={'Range': f'bytes={SIZE}-'})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    assert response.status == 416
+    assert response.headers['Content-Range'] == f'bytes */{SIZE}'
+
+
+def test_server_without_ranges(served, tmp_path):
+    (tmp_path / 'data.bin').write_bytes(b'x' * 100)
+
+    class QuietHandler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = start_server(str(tmp_path), QuietHandler)
+    try:
+        with pytest.raises(RemoteZipError, match='range requests'):
+            RemoteFile(f"http://127.0.0.1:{server.server_port}/data.bin")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_missing_file(served):
+    url, _ = served
+    with pytest.raises(RemoteZipError):
+        RemoteFile(f"{url}/missing.bin")
@@ -0,0 +1,61 @@
+"""
+Tests for the GitHub webhook endpoint
+"""
+import asyncio
+import json
+import socket
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from webhook_server import WebhookServer, send_fake_event, sign
+
+SECRET = 'test-secret'
+PATH = '/github/webhook'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def with_server(exchange):
+    """Run exchange(url) against a live server, return (result, delivered runs)."""
+    delivered = []
+    port = free_port()
+    server = WebhookServer(SECRET, delivered.append, host='127.0.0.1', port=port, path=PATH)
+    await server.start()
+    try:
+        return await exchange(f"http://127.0.0.1:{port}{PATH}"), delivered
+    finally:
+        await server.stop()
+
+
+def test_signed_event_is_delivered():
+    status, delivered = asyncio.run(with_server(lambda url: send_fake_event(url, SECRET, 42, 'failure')))
+    assert 200 <= status < 300
+    assert delivered == [{'id': 42, 'status': 'completed', 'conclusion': 'failure'}]
+
+
+def test_tampered_event_is_rejected():
+    body = json.dumps({'workflow_run': {'id': 42, 'status': 'completed', 'conclusion': 'failure'}}).encode()
+    signature = sign(SECRET, body)
+    tampered = body.replace(b'failure', b'success')
+
+    async def post(url):
+        headers = {'X-GitHub-Event': 'workflow_run', 'X-Hub-Signature-256': signature}
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, data=tampered, headers=headers) as response:
+                return response.status
+
+    status, delivered = asyncio.run(with_server(post))
+    assert status == 401
+    assert delivered == []
+
+
+def test_wrong_secret_is_rejected():
+    status, delivered = asyncio.run(with_server(lambda url: send_fake_event(url, 'other-secret', 42)))
+    assert status == 401
+    assert delivered == []
@@ -0,0 +1,134 @@
+"""
+GitHub webhook endpoint for ROM Builder Bot
+Receives signed workflow_run events so jobs complete without polling
+
+Run directly to send a signed fake event to a local bot:
+    python webhook_server.py <run_id> [conclusion] [url]
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import sys
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+def sign(secret: str, body: bytes) -> str:
+    """X-Hub-Signature-256 header value for a request body."""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(secret: str, body: bytes, signature: str) -> bool:
+    """Constant time check of a GitHub webhook signature."""
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign(secret, body), signature)
+
+
+class WebhookServer:
+    """Small aiohttp server accepting GitHub ``workflow_run`` webhooks.
+
+    Every validly signed ``workflow_run`` event is passed to
+    ``handler(run)``; the bot hands it to the run poller, which completes
+    the matching jobs immediately. Polling stays active as a fallback for
+    missed deliveries.
+    """
+
+    def __init__(self, secret: str, handler, host: str = '0.0.0.0',
+                 port: int = 8080, path: str = '/github/webhook'):
+        self.secret = secret
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.path = path
+        self._runner = None
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def start(self):
+        """Start listening."""
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logger.info(f"Webhook endpoint listening on {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        """Stop listening."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        if not verify_signature(self.secret, body, request.headers.get('X-Hub-Signature-256')):
+            logger.warning("Rejected webhook with invalid signature")
+            return web.Response(status=401, text='invalid signature')
+
+        event = request.headers.get('X-GitHub-Event')
+        if event == 'ping':
+            return web.Response(text='pong')
+        if event != 'workflow_run':
+            return web.Response(status=202, text='ignored')
+
+        try:
+            run = json.loads(body)['workflow_run']
+        except (ValueError, KeyError):
+            return web.Response(status=400, text='malformed payload')
+
+        try:
+            self.handler(run)
+        except Exception as e:
+            logger.error(f"Webhook handler failed for run {run.get('id')}: {e}")
+            return web.Response(status=500, text='handler error')
+        return web.Response(text='ok')
+
+
+async def send_fake_event(url: str, secret: str, run_id: int,
+                          conclusion: str = 'success', status: str = 'completed') -> int:
+    """POST a signed fake workflow_run event, return the HTTP status."""
+    payload = {
+        'action': 'completed' if status == 'completed' else 'in_progress',
+        'workflow_run': {
+            'id': run_id,
+            'status': status,
+            'conclusion': conclusion if status == 'completed' else None
+        }
+    }
+    body = json.dumps(payload).encode()
+    headers = {
+        'Content-Type': 'application/json',
+        'X-GitHub-Event': 'workflow_run',
+        'X-Hub-Signature-256': sign(secret, body)
+    }
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, data=body, headers=headers) as response:
+            return response.status
+
+
+def main():
+    from config import WEBHOOK_SECRET, WEBHOOK_PORT, WEBHOOK_PATH
+
+    if len(sys.argv) < 2:
+        print("Usage: webhook_server.py <run_id> [conclusion] [url]")
+        sys.exit(1)
+
+    run_id = int(sys.argv[1])
+    conclusion = sys.argv[2] if len(sys.argv) > 2 else 'success'
+    url = sys.argv[3] if len(sys.argv) > 3 else f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+
+    status = asyncio.run(send_fake_event(url, WEBHOOK_SECRET, run_id, conclusion))
+    print(f"Webhook delivered: HTTP {status}")
+    sys.exit(0 if status == 200 else 1)
+
+
+if __name__ == '__main__':
+    main()